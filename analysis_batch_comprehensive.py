@@ -2,6 +2,13 @@ import pandas as pd
 import numpy as np
 import os
 import glob
+from concurrent.futures import ProcessPoolExecutor
+
+from src.bootstrap import bootstrap_kpis, paired_bootstrap_test
+
+# Bootstrap a blocchi degli incrementi di P&L
+N_BOOTSTRAP = 2000
+BOOTSTRAP_SEED = 42
 
 def calculate_kpi(df, strategy_name, category, moneyness, expiry):
     """
@@ -58,10 +65,43 @@ def calculate_kpi(df, strategy_name, category, moneyness, expiry):
         'Ticks': total_ticks
     }
 
+def bootstrap_run_group(task):
+    """
+    Bootstrap per una combinazione (Category, Moneyness, Expiry): CI per ogni
+    strategia e test a coppie Custom_Adaptive - Whalley sugli stessi tick.
+    Eseguita in un processo separato per ogni gruppo.
+    """
+    (category, moneyness, expiry), paths, seed = task
+    logs = {strat: pd.read_csv(path) for strat, path in paths.items()}
+
+    rows = {}
+    for strat, df in logs.items():
+        ci = bootstrap_kpis(df, n_boot=N_BOOTSTRAP, seed=seed)
+        rows[strat] = {'Strategy': strat, 'Category': category, 'Moneyness': moneyness,
+                       'Expiry': expiry, **ci}
+
+    if 'Whalley' in logs and 'Custom_Adaptive' in logs:
+        paired = paired_bootstrap_test(logs['Custom_Adaptive'], logs['Whalley'],
+                                       n_boot=N_BOOTSTRAP, seed=seed)
+        rows['Custom_Adaptive'].update(paired)
+        # Per la riga Whalley la differenza è invertita (Whalley - Custom_Adaptive)
+        for key, value in paired.items():
+            if key.endswith('_P_Value'):
+                rows['Whalley'][key] = value
+            elif key.endswith('_CI_Low'):
+                rows['Whalley'][key] = -paired[key.replace('_CI_Low', '_CI_High')]
+            elif key.endswith('_CI_High'):
+                rows['Whalley'][key] = -paired[key.replace('_CI_High', '_CI_Low')]
+            else:
+                rows['Whalley'][key] = -value
+
+    return list(rows.values())
+
 def run_comprehensive_analysis():
     print("--- AVVIO ANALISI COMPARATIVA MASSIVA ---")
     
     all_results = []
+    run_paths = {}
     
     # 1. DEFINIZIONE PERCORSI DA SCANSIONARE
     # Struttura: (Nome Strategia, Percorso Cartella Root dei risultati)
@@ -106,6 +146,7 @@ def run_comprehensive_analysis():
                 
                 if kpi:
                     all_results.append(kpi)
+                    run_paths.setdefault((category, moneyness, expiry), {})[strat_name] = file_path
                     # print(f"   -> OK: {category} - {moneyness}")
                 
             except Exception as e:
@@ -117,6 +158,23 @@ def run_comprehensive_analysis():
         return
 
     df_final = pd.DataFrame(all_results)
+
+    # 2b. BOOTSTRAP (in parallelo sui gruppi di run)
+    print(f"\nBootstrap a blocchi ({N_BOOTSTRAP} replicati) su {len(run_paths)} gruppi...")
+    tasks = [(key, paths, BOOTSTRAP_SEED + i) for i, (key, paths) in enumerate(sorted(run_paths.items()))]
+    boot_rows = []
+    with ProcessPoolExecutor() as executor:
+        futures = [(task[0], executor.submit(bootstrap_run_group, task)) for task in tasks]
+        for key, future in futures:
+            # Un gruppo che fallisce resta senza CI, come i file scartati nella scansione
+            try:
+                boot_rows.extend(future.result())
+            except Exception as e:
+                print(f"   -> ERRORE bootstrap gruppo {key}: {e}")
+
+    if boot_rows:
+        df_boot = pd.DataFrame(boot_rows)
+        df_final = df_final.merge(df_boot, on=['Strategy', 'Category', 'Moneyness', 'Expiry'], how='left')
     
     # Ordina per pulizia
     df_final = df_final.sort_values(by=['Category', 'Moneyness', 'Expiry', 'Strategy'])
@@ -138,5 +196,10 @@ def run_comprehensive_analysis():
     )
     print(pivot)
 
+    if 'Paired_Final_PnL_P_Value' in df_final.columns:
+        significant = df_final[(df_final['Strategy'] == 'Custom_Adaptive') & (df_final['Paired_Final_PnL_P_Value'] < 0.05)]
+        print(f"\nDifferenze P&L significative (p < 0.05, Custom_Adaptive vs Whalley): "
+              f"{len(significant)}/{(df_final['Strategy'] == 'Custom_Adaptive').sum()}")
+
 if __name__ == "__main__":
     run_comprehensive_analysis()
\ No newline at end of file
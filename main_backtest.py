@@ -2,7 +2,7 @@ import pandas as pd
 import numpy as np
 import time
 
-from src.data_loaders import VolatilityManager, RatesManager, DividendsManager
+from src.data_loaders import load_volatility_engine, RatesManager, DividendsManager
 from src.strategy import WhalleyHedgingStrategy 
 # MODIFICATO: Importiamo pbs_price
 from src.models import pbs_delta, pbs_gamma, pbs_price 
@@ -18,7 +18,7 @@ def run_backtest():
     spot_path = "data/spot_prices_min.parquet"
 
     try:
-        vol_engine = VolatilityManager(vol_path)
+        vol_engine = load_volatility_engine(vol_path)
         rates_engine = RatesManager(rates_path)
         div_engine = DividendsManager(div_path)
     except FileNotFoundError as e:
@@ -32,11 +32,11 @@ def run_backtest():
     
     # 2. PERIODO
     spot_start = df_spot['AsOfDate'].min()
-    vol_start = vol_engine.df.index.levels[0].min()
+    vol_start = vol_engine.available_dates().min()
     sim_start_date = max(spot_start, vol_start)
     
     # 3. SCADENZA
-    available_expiries = vol_engine.df.index.levels[1].unique()
+    available_expiries = vol_engine.available_expiries()
     valid_expiries = [e for e in available_expiries if e > sim_start_date + pd.Timedelta(days=45)]
     
     if not valid_expiries:
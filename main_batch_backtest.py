@@ -3,9 +3,11 @@ import numpy as np
 import time
 import os
 
-from src.data_loaders import VolatilityManager, RatesManager, DividendsManager
+from src.data_loaders import load_volatility_engine, RatesManager, DividendsManager
 from src.strategy import WhalleyHedgingStrategy 
 from src.models import pbs_delta, pbs_gamma, pbs_price 
+from src.scenarios import book_final_state, save_risk_ladder
+from src.event_driven import run_whalley_event_driven
 
 # CONFIGURAZIONE MONEYNESS
 MONEYNESS_LEVELS = {
@@ -21,6 +23,11 @@ TERM_THRESHOLDS = {
     'Lungo_Termine': 9999    # Oltre 6 mesi
 }
 
+# MODALITÀ EVENT-DRIVEN: Greeks solo a inizio giorno e ai tick che rompono la banda.
+# I log sono sparsi (eventi), quindi vanno in una cartella separata da 'results'.
+EVENT_DRIVEN = False
+RESULTS_ROOT = "results_event" if EVENT_DRIVEN else "results"
+
 def ensure_dir(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
@@ -42,7 +49,7 @@ def run_single_simulation(vol_engine, rates_engine, div_engine, df_spot,
     
     # 2. Setup Periodo
     # La simulazione parte dalla data globale di inizio dati (o poco dopo)
-    start_date = max(df_spot['AsOfDate'].min(), vol_engine.df.index.levels[0].min())
+    start_date = max(df_spot['AsOfDate'].min(), vol_engine.available_dates().min())
     
     # IMPORTANTE: Se la scadenza è già passata rispetto all'inizio dati, saltiamo
     if expiry_date <= start_date:
@@ -54,34 +61,40 @@ def run_single_simulation(vol_engine, rates_engine, div_engine, df_spot,
     if len(df_sim) == 0:
         return
 
-    # 3. Setup Strategia
-    whalley_strat = WhalleyHedgingStrategy(risk_aversion=1.0, transaction_cost=0.002)
+    # 3-4. Strategia e Loop Trading
+    if EVENT_DRIVEN:
+        whalley_strat = run_whalley_event_driven(vol_engine, rates_engine, div_engine, df_sim,
+                                                 expiry_date, TARGET_STRIKE,
+                                                 risk_aversion=1.0, transaction_cost=0.002)
+    else:
+        # 3. Setup Strategia
+        whalley_strat = WhalleyHedgingStrategy(risk_aversion=1.0, transaction_cost=0.002)
     
-    # 4. Loop Trading
-    for row in df_sim.itertuples():
-        now = row.AsOfDate
-        spot = row.Spot
-        today_date = pd.Timestamp(now.date()) 
+        # 4. Loop Trading
+        for row in df_sim.itertuples():
+            now = row.AsOfDate
+            spot = row.Spot
+            today_date = pd.Timestamp(now.date()) 
         
-        T = (expiry_date - now).total_seconds() / (365.25 * 24 * 3600)
-        if T <= 0.0001: break
+            T = (expiry_date - now).total_seconds() / (365.25 * 24 * 3600)
+            if T <= 0.0001: break
 
-        q = div_engine.get_yield_q(today_date)
-        tau_days = T * 365.25
-        r = rates_engine.get_risk_free_rate(today_date, tau_days)
+            q = div_engine.get_yield_q(today_date)
+            tau_days = T * 365.25
+            r = rates_engine.get_risk_free_rate(today_date, tau_days)
         
-        iv = vol_engine.get_interpolated_iv(today_date, expiry_date, TARGET_STRIKE)
+            iv = vol_engine.get_interpolated_iv(today_date, expiry_date, TARGET_STRIKE)
         
-        if iv is not None and iv > 0:
-            spot_adj = spot * np.exp(-q * T)
-            delta = pbs_delta(spot_adj, TARGET_STRIKE, T, r, 0, iv)
-            gamma = pbs_gamma(spot_adj, TARGET_STRIKE, T, r, 0, iv)
-            opt_price = pbs_price(spot_adj, TARGET_STRIKE, T, r, 0, iv)
+            if iv is not None and iv > 0:
+                spot_adj = spot * np.exp(-q * T)
+                delta = pbs_delta(spot_adj, TARGET_STRIKE, T, r, 0, iv)
+                gamma = pbs_gamma(spot_adj, TARGET_STRIKE, T, r, 0, iv)
+                opt_price = pbs_price(spot_adj, TARGET_STRIKE, T, r, 0, iv)
             
-            whalley_strat.rebalance(now, spot, T, r, delta, gamma, opt_price)
+                whalley_strat.rebalance(now, spot, T, r, delta, gamma, opt_price)
 
     # 5. Salvataggio
-    output_dir = os.path.join("results", category)
+    output_dir = os.path.join(RESULTS_ROOT, category)
     ensure_dir(output_dir)
     
     filename = f"{moneyness_label}_{expiry_date.date()}.csv"
@@ -92,6 +105,10 @@ def run_single_simulation(vol_engine, rates_engine, div_engine, df_spot,
         res.to_csv(full_path, index=False)
         print(f"       [OK] Salvato: {full_path} ({len(res)} ticks)")
 
+    # 6. Stato finale del book (per la risk ladder)
+    return book_final_state(res, df_sim, f"{moneyness_label}_{expiry_date.date()}", expiry_date, TARGET_STRIKE,
+                            vol_engine, rates_engine, div_engine)
+
 def run_batch_backtest():
     start_time = time.time()
     print(f"--- AVVIO BATCH BACKTEST WHALLEY (AUTO-DISCOVERY) ---")
@@ -100,7 +117,7 @@ def run_batch_backtest():
     try:
         vol_path = "data/iv_surface_empirical_anchored.parquet"
         print(f"Lettura superficie per estrazione scadenze: {vol_path}")
-        vol_engine = VolatilityManager(vol_path)
+        vol_engine = load_volatility_engine(vol_path)
         
         rates_engine = RatesManager("data/daily_rates_linear_smoothed_long.parquet")
         div_engine = DividendsManager("data/dividends.parquet")
@@ -116,10 +133,10 @@ def run_batch_backtest():
     # 2. ESTERAZIONE SCADENZE DAL PARQUET
     # L'indice del vol_engine è MultiIndex (AsOfDate, expiry_date)
     # Prendiamo tutte le expiry_date uniche presenti nel livello 1 dell'indice
-    all_expiries = vol_engine.df.index.get_level_values('expiry_date').unique().sort_values()
+    all_expiries = vol_engine.available_expiries()
     
     # Data Inizio Simulazione (Intersezione dati spot e vol)
-    global_start_date = max(df_spot['AsOfDate'].min(), vol_engine.df.index.levels[0].min())
+    global_start_date = max(df_spot['AsOfDate'].min(), vol_engine.available_dates().min())
     print(f"Inizio Dati Disponibili: {global_start_date.date()}")
     
     # Filtriamo solo le scadenze future rispetto all'inizio dati
@@ -127,6 +144,7 @@ def run_batch_backtest():
     print(f"Trovate {len(future_expiries)} scadenze future da processare.")
 
     # 3. CICLO SULLE SCADENZE
+    final_states = []
     for i, expiry in enumerate(future_expiries):
         # Calcolo Giorni alla scadenza (rispetto all'inizio simulazione)
         days_to_expiry = (expiry - global_start_date).days
@@ -145,13 +163,18 @@ def run_batch_backtest():
 
         # Lancia le 3 Moneyness
         for moneyness in ['ITM', 'ATM', 'OTM']:
-            run_single_simulation(
+            state = run_single_simulation(
                 vol_engine, rates_engine, div_engine, df_spot,
                 expiry_date=expiry,
                 category=category,
                 initial_spot=initial_spot,
                 moneyness_label=moneyness
             )
+            if state:
+                final_states.append(state)
+
+    # 4. RISK LADDER (spot x vol) sui book aperti
+    save_risk_ladder(final_states, "RISK_LADDER_WHALLEY.csv")
 
     elapsed = time.time() - start_time
     print(f"\n--- BATCH COMPLETO in {elapsed:.2f}s ---")
@@ -0,0 +1,21 @@
+import time
+
+from src.data_loaders import build_iv_partitions
+
+def run_build_partitions():
+    start_time = time.time()
+    print(f"--- PARTIZIONAMENTO SUPERFICIE IV PER DATA ---")
+
+    try:
+        build_iv_partitions("data/iv_surface_empirical_anchored.parquet", "data/iv_partitions")
+    except FileNotFoundError as e:
+        print(f"ERRORE: {e}")
+        return
+
+    elapsed = time.time() - start_time
+    print(f"\nCompletato in {elapsed:.2f}s.")
+    print("I main useranno automaticamente 'data/iv_partitions' (caricamento lazy per giorno);")
+    print("se la superficie sorgente cambia, le partizioni vengono ricostruite al caricamento.")
+
+if __name__ == "__main__":
+    run_build_partitions()
@@ -0,0 +1,34 @@
+import pandas as pd
+import time
+
+from src.data_loaders import RatesManager, DividendsManager
+from src.iv_solver import build_iv_surface
+
+def run_build_surface():
+    start_time = time.time()
+    print(f"--- COSTRUZIONE SUPERFICIE IV DA QUOTAZIONI ---")
+
+    quotes_path = "data/option_quotes.parquet"
+    output_path = "data/iv_surface_from_quotes.parquet"
+
+    try:
+        rates_engine = RatesManager("data/daily_rates_linear_smoothed_long.parquet")
+        div_engine = DividendsManager("data/dividends.parquet")
+        quotes = pd.read_parquet(quotes_path)
+    except FileNotFoundError as e:
+        print(f"ERRORE: {e}")
+        return
+
+    print(f"Quotazioni lette: {len(quotes)}")
+    surface = build_iv_surface(quotes, rates_engine, div_engine)
+    surface.to_parquet(output_path, index=False)
+
+    elapsed = time.time() - start_time
+    print(f"\nCompletato in {elapsed:.2f}s.")
+    print(f"Salvato in: {output_path} ({len(surface)} punti)")
+    print("I main leggono 'data/iv_surface_empirical_anchored.parquet': per usare questa superficie")
+    print(f"passare '{output_path}' a load_volatility_engine (vol_path nei main); le partizioni")
+    print("in data/iv_partitions vengono ricostruite automaticamente al cambio di sorgente.")
+
+if __name__ == "__main__":
+    run_build_surface()
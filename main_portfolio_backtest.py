@@ -0,0 +1,94 @@
+import pandas as pd
+import numpy as np
+import time
+import os
+
+from src.data_loaders import load_volatility_engine, RatesManager, DividendsManager
+from src.greeks_engine import daily_book_greeks
+from src.portfolio import PortfolioHedger
+
+# CONFIGURAZIONI (stesse dei batch per singolo book)
+MONEYNESS_LEVELS = {'ITM': 0.95, 'ATM': 1.00, 'OTM': 1.05}
+OUTPUT_DIR = "results_portfolio"
+
+def ensure_dir(directory):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def run_portfolio_backtest():
+    start_time = time.time()
+    print(f"--- AVVIO BACKTEST DI PORTAFOGLIO (DELTA NETTING) ---")
+
+    try:
+        vol_engine = load_volatility_engine("data/iv_surface_empirical_anchored.parquet")
+        rates_engine = RatesManager("data/daily_rates_linear_smoothed_long.parquet")
+        div_engine = DividendsManager("data/dividends.parquet")
+    except FileNotFoundError as e:
+        print(f"ERRORE FATALE MOTORI: {e}")
+        return
+
+    print("Caricamento Spot Prices...")
+    df_spot = pd.read_parquet("data/spot_prices_min.parquet")
+    df_spot['AsOfDate'] = pd.to_datetime(df_spot['AsOfDate'])
+    df_spot = df_spot.sort_values("AsOfDate")
+
+    # 1. DISCOVERY (come main_batch_backtest)
+    all_expiries = vol_engine.available_expiries()
+    global_start_date = max(df_spot['AsOfDate'].min(), vol_engine.available_dates().min())
+    future_expiries = [e for e in all_expiries if e > global_start_date]
+    if not future_expiries:
+        print("Nessuna scadenza futura trovata.")
+        return
+
+    df_sim = df_spot[(df_spot['AsOfDate'] >= global_start_date) & (df_spot['AsOfDate'] <= future_expiries[-1])]
+    df_sim = df_sim.reset_index(drop=True)
+    initial_spot = df_sim['Spot'].iloc[0]
+
+    # 2. BOOK = (scadenza, moneyness), tutti sullo stesso sottostante
+    books = []
+    for expiry in future_expiries:
+        for moneyness, level in MONEYNESS_LEVELS.items():
+            strike = round(initial_spot * level / 50) * 50
+            books.append((f"{moneyness}_{expiry.date()}", expiry, strike))
+    print(f"Book da nettare: {len(books)} | Ticks: {len(df_sim)}")
+
+    # 3-4. GREEKS PER GIORNO (tutti i book) E LOOP DI HEDGING (vettoriale sui book)
+    # La memoria resta limitata a book x tick di un giorno
+    hedger = PortfolioHedger([b[0] for b in books], [b[2] for b in books], risk_aversion=1.0, transaction_cost=0.002)
+    times = df_sim['AsOfDate']
+    spots = df_sim['Spot'].to_numpy()
+
+    for block in daily_book_greeks(vol_engine, rates_engine, div_engine, df_sim,
+                                   [b[1] for b in books], [b[2] for b in books]):
+        T, delta, gamma, price = block['T'], block['Delta'], block['Gamma'], block['Option_Value']
+        active, expired = block['Valid'], block['Expired']
+        for k, i in enumerate(range(block['start'], block['end'])):
+            # Tick utile se c'è un book vivo o un book appena scaduto da regolare
+            if not active[k].any() and not (expired[k] & ~hedger.settled).any():
+                continue
+            hedger.rebalance(times.iloc[i], spots[i], T[k], None, delta[k], gamma[k], price[k],
+                             active=active[k], expired=expired[k])
+
+    # 5. SALVATAGGIO
+    ensure_dir(OUTPUT_DIR)
+    log_path = os.path.join(OUTPUT_DIR, "PORTFOLIO_NET_LOG.csv")
+    books_path = os.path.join(OUTPUT_DIR, "PORTFOLIO_BOOK_ATTRIBUTION.csv")
+    hedger.get_log_dataframe().to_csv(log_path, index=False)
+    hedger.get_book_dataframe().to_csv(books_path, index=False)
+
+    summary = hedger.get_netting_summary()
+    print("\n=== RISPARMIO DA NETTING ===")
+    print(f"Costi Stand-alone:     € {summary['Standalone_Costs_EUR']:.2f} ({summary['Standalone_Trades']} trade)")
+    print(f"Costi Nettati:         € {summary['Netted_Costs_EUR']:.2f} ({summary['Netted_Trades']} trade)")
+    print(f"Risparmio:             € {summary['Cost_Saved_EUR']:.2f} ({summary['Cost_Saved_Pct']:.1f}%)")
+    print(f"  (include l'effetto della banda aggregata H(somma Gamma) < somma H(Gamma_i))")
+    print(f"Incrocio interno:      {summary['Internal_Crossed_Shares']:.4f} azioni")
+    print(f"Costi a parità banda:  € {summary['Equal_Band_Costs_EUR']:.2f} ({summary['Equal_Band_Trades']} trade)")
+    print(f"Risparmio da netting:  € {summary['Netting_Saved_EUR']:.2f} ({summary['Netting_Saved_Pct']:.1f}%)")
+
+    elapsed = time.time() - start_time
+    print(f"\nCompletato in {elapsed:.2f}s.")
+    print(f"Salvati: {log_path}, {books_path}")
+
+if __name__ == "__main__":
+    run_portfolio_backtest()
@@ -4,8 +4,9 @@ import time
 import os
 
 # 1. IMPORT STANDARD (Ora funzionano perché siamo nella root)
-from src.data_loaders import VolatilityManager, RatesManager, DividendsManager
+from src.data_loaders import load_volatility_engine, RatesManager, DividendsManager
 from src.models import pbs_delta, pbs_gamma, pbs_price 
+from src.scenarios import book_final_state, save_risk_ladder
 
 # 2. IMPORT STRATEGIA PROPRIETARIA
 # Python vede la cartella 'proprietary_strat' come un pacchetto
@@ -31,7 +32,7 @@ def run_single_simulation(vol_engine, rates_engine, div_engine, df_spot,
     target_strike_raw = initial_spot * MONEYNESS_LEVELS[moneyness_label]
     TARGET_STRIKE = round(target_strike_raw / 50) * 50 
     
-    start_date = max(df_spot['AsOfDate'].min(), vol_engine.df.index.levels[0].min())
+    start_date = max(df_spot['AsOfDate'].min(), vol_engine.available_dates().min())
     if expiry_date <= start_date: return
 
     df_sim = df_spot[(df_spot['AsOfDate'] >= start_date) & (df_spot['AsOfDate'] <= expiry_date)]
@@ -85,13 +86,17 @@ def run_single_simulation(vol_engine, rates_engine, div_engine, df_spot,
         res.to_csv(full_path, index=False)
         print(f"       [OK] Salvato: {filename}")
 
+    # Stato finale del book (per la risk ladder)
+    return book_final_state(res, df_sim, f"CUSTOM_{moneyness_label}_{expiry_date.date()}", expiry_date, TARGET_STRIKE,
+                            vol_engine, rates_engine, div_engine)
+
 def run_batch_proprietary():
     start_time = time.time()
     print(f"--- AVVIO BATCH: PROPRIETARY STRATEGY ---")
 
     try:
         # Percorsi semplici relativi alla root
-        vol_engine = VolatilityManager("data/iv_surface_empirical_anchored.parquet")
+        vol_engine = load_volatility_engine("data/iv_surface_empirical_anchored.parquet")
         rates_engine = RatesManager("data/daily_rates_linear_smoothed_long.parquet")
         div_engine = DividendsManager("data/dividends.parquet")
     except FileNotFoundError as e:
@@ -104,11 +109,12 @@ def run_batch_proprietary():
     df_spot = df_spot.sort_values("AsOfDate")
     
     # Discovery
-    all_expiries = vol_engine.df.index.get_level_values('expiry_date').unique().sort_values()
-    global_start = max(df_spot['AsOfDate'].min(), vol_engine.df.index.levels[0].min())
+    all_expiries = vol_engine.available_expiries()
+    global_start = max(df_spot['AsOfDate'].min(), vol_engine.available_dates().min())
     future_expiries = [e for e in all_expiries if e > global_start]
     
     print(f"Trovate {len(future_expiries)} scadenze future.")
+    final_states = []
 
     for i, expiry in enumerate(future_expiries):
         days_to_expiry = (expiry - global_start).days
@@ -123,11 +129,15 @@ def run_batch_proprietary():
         except: continue
 
         for moneyness in ['ITM', 'ATM', 'OTM']:
-            run_single_simulation(
+            state = run_single_simulation(
                 vol_engine, rates_engine, div_engine, df_spot,
                 expiry, category, initial_spot, moneyness
             )
+            if state: final_states.append(state)
             
+    # Risk ladder (spot x vol) sui book aperti
+    save_risk_ladder(final_states, "RISK_LADDER_CUSTOM.csv")
+
     elapsed = time.time() - start_time
     print(f"\n--- BATCH PROPRIETARIO COMPLETATO ({elapsed:.2f}s) ---")
 
@@ -0,0 +1,182 @@
+import sys
+import time
+
+from src.regression_gate import (
+    make_synthetic_inputs, load_recorded_inputs, reference_loop, timed,
+    compare_logs, compare_event_log, compare_kpis, check_golden_report, check_golden_whalley, check_throughput,
+    load_golden_logs, save_golden_logs, LOG_ENGINES, KPI_ENGINES, EVENT_ENGINES
+)
+from analysis_batch_comprehensive import calculate_kpi
+
+BASELINE_PATH = "perf_baseline.json"
+GOLDEN_LOGS_PATH = "golden_synthetic_logs.parquet"  # Log del loop di riferimento sugli input sintetici
+THROUGHPUT_TOLERANCE = 0.30  # Fallisce se un motore perde più del 30% di ticks/s
+RECORDED_EXPIRIES = 2        # Scadenze reali usate per l'equivalenza (se data/ esiste)
+
+def print_outcome(name, book, outcome, unit="righe"):
+    status = "OK" if outcome['passed'] else "FAIL"
+    print(f"   [{status}] {name:<22} {book}: {outcome['rows_candidate']} {unit}")
+    for col, err in outcome['column_errors'].items():
+        print(f"          colonna {col}: max |diff| = {err}")
+    for ts, ref_action, new_action in outcome['decision_mismatches'][:10]:
+        print(f"          decisione diversa @ {ts}: {ref_action} -> {new_action}")
+
+def book_simulations(vol_engine, df_spot, books):
+    """ (chiave book, scadenza, strike, df_sim) per ogni book, come nei main """
+    start_date = max(df_spot['AsOfDate'].min(), vol_engine.available_dates().min())
+    for expiry, strike in books:
+        df_sim = df_spot[(df_spot['AsOfDate'] >= start_date) & (df_spot['AsOfDate'] <= expiry)]
+        yield f"{expiry.date()} K={strike}", expiry, strike, df_sim
+
+def record_golden_logs(vol_engine, rates_engine, div_engine, df_spot, books):
+    """ Log del loop di riferimento per ogni (strategia, book): da salvare con --update-golden """
+    return {(strategy, book_key): reference_loop(strategy, vol_engine, rates_engine, div_engine, df_sim, expiry, strike)
+            for book_key, expiry, strike, df_sim in book_simulations(vol_engine, df_spot, books)
+            for strategy in ('Whalley', 'Custom_Adaptive')}
+
+def run_equivalence(label, vol_engine, rates_engine, div_engine, df_spot, books, ticks_done, seconds, golden=None,
+                    log_engines_only=False):
+    """
+    Riferimento vs motori veloci su ogni book; aggiorna i contatori di throughput.
+    golden: log salvati {(strategia, book): log}. Se dato, tutti i motori,
+    compreso il loop di riferimento, sono confrontati con i log salvati, così
+    una modifica a codice condiviso (get_interpolated_iv, rebalance, pbs_*)
+    non sposta insieme riferimento e motori veloci.
+    Senza golden (dati registrati) i motori veloci sono confrontati col riferimento.
+    log_engines_only: solo riferimento e LOG_ENGINES (secondo passaggio su un altro vol_engine).
+    """
+    passed = True
+
+    for book_key, expiry, strike, df_sim in book_simulations(vol_engine, df_spot, books):
+        book = f"{label} {book_key}"
+        references = {}
+
+        for strategy in ('Whalley', 'Custom_Adaptive'):
+            ref_log, elapsed = timed(reference_loop, strategy, vol_engine, rates_engine, div_engine, df_sim, expiry, strike)
+            name = f"reference_{strategy.lower()}"
+            ticks_done[name] = ticks_done.get(name, 0) + len(ref_log)
+            seconds[name] = seconds.get(name, 0.0) + elapsed
+            references[strategy] = ref_log
+
+            if golden is not None:
+                stored = golden.get((strategy, book_key))
+                if stored is None:
+                    print(f"   [FAIL] {name:<22} {book}: log di riferimento salvato mancante")
+                    passed = False
+                    continue
+                outcome = compare_logs(stored, ref_log)
+                passed &= outcome['passed']
+                print_outcome(name, book, outcome)
+                references[strategy] = stored
+
+        for name, (strategy, engine) in LOG_ENGINES.items():
+            log, elapsed = timed(engine, strategy, vol_engine, rates_engine, div_engine, df_sim, expiry, strike)
+            ticks_done[name] = ticks_done.get(name, 0) + len(log)
+            seconds[name] = seconds.get(name, 0.0) + elapsed
+
+            outcome = compare_logs(references[strategy], log)
+            passed &= outcome['passed']
+            print_outcome(name, book, outcome)
+
+        if log_engines_only:
+            continue
+
+        for name, (strategy, engine) in EVENT_ENGINES.items():
+            log, elapsed = timed(engine, vol_engine, rates_engine, div_engine, df_sim, expiry, strike)
+            # Throughput in tick di mercato coperti (non righe di log)
+            ticks_done[name] = ticks_done.get(name, 0) + len(references[strategy])
+            seconds[name] = seconds.get(name, 0.0) + elapsed
+
+            outcome = compare_event_log(references[strategy], log)
+            passed &= outcome['passed']
+            print_outcome(name, book, outcome, unit="eventi")
+
+        for name, (strategy, engine) in KPI_ENGINES.items():
+            kpi, elapsed = timed(engine, vol_engine, rates_engine, div_engine, df_sim, expiry, strike)
+            ticks_done[name] = ticks_done.get(name, 0) + int(kpi['Ticks'])
+            seconds[name] = seconds.get(name, 0.0) + elapsed
+
+            ref_kpi = calculate_kpi(references[strategy].copy(), strategy, '', '', '')
+            outcome = compare_kpis(ref_kpi, kpi)
+            passed &= outcome['passed']
+            status = "OK" if outcome['passed'] else "FAIL"
+            print(f"   [{status}] {name:<22} {book}: KPI")
+            for col, (ref_value, new_value) in outcome['column_errors'].items():
+                print(f"          KPI {col}: {ref_value} -> {new_value}")
+
+    return passed
+
+def run_regression_gate():
+    start_time = time.time()
+    update_baseline = "--update-baseline" in sys.argv
+    update_golden = "--update-golden" in sys.argv
+    print(f"--- GATE DI EQUIVALENZA E PERFORMANCE ---")
+    passed = True
+
+    # 1. REPORT DI RIFERIMENTO (FINAL_COMPARISON_REPORT.csv vs log in results/)
+    print("\n[1] KPI del report di riferimento")
+    golden = check_golden_report(calculate_kpi)
+    passed &= golden['passed']
+    print(f"   Righe verificate: {golden['checked']} | Differenze: {len(golden['failures'])}")
+    for path, errors in golden['failures'][:10]:
+        print(f"   [FAIL] {path}: {errors}")
+
+    # 2. EQUIVALENZA SU INPUT SINTETICI (e registrati, se disponibili)
+    ticks_done, seconds = {}, {}
+    print("\n[2] Equivalenza motori (input sintetici vs log salvati in " + GOLDEN_LOGS_PATH + ")")
+    vol_engine, rates_engine, div_engine, df_spot, books, partitioned_engine = make_synthetic_inputs()
+    if update_golden:
+        new_golden = record_golden_logs(vol_engine, rates_engine, div_engine, df_spot, books)
+        save_golden_logs(new_golden, GOLDEN_LOGS_PATH)
+        print(f"   Log di riferimento aggiornati: {GOLDEN_LOGS_PATH} ({len(new_golden)} log)")
+    golden_logs = load_golden_logs(GOLDEN_LOGS_PATH)
+    if not golden_logs:
+        print(f"   [FAIL] {GOLDEN_LOGS_PATH} non trovato: generarlo con --update-golden")
+        passed = False
+    else:
+        passed &= run_equivalence("synthetic", vol_engine, rates_engine, div_engine, df_spot, books, ticks_done, seconds,
+                                  golden=golden_logs)
+
+        # Stessi log attesi con lo store partizionato (load_volatility_engine nei main).
+        # Throughput non conteggiato: la baseline è sul VolatilityManager.
+        print("\n[2a] Equivalenza motori con PartitionedVolatilityManager (stessi log salvati)")
+        passed &= run_equivalence("partitioned", partitioned_engine, rates_engine, div_engine, df_spot, books, {}, {},
+                                  golden=golden_logs, log_engines_only=True)
+        print(f"   Giorni letti da disco: {partitioned_engine.loads}, picco in cache: {partitioned_engine.peak_cached_days}")
+
+    recorded = load_recorded_inputs()
+    if recorded is None:
+        print("\n   Dati registrati (data/) non trovati: salto results_whalley.csv e i book reali.")
+    else:
+        print("\n[2b] results_whalley.csv (dati registrati)")
+        outcome = check_golden_whalley(recorded)
+        passed &= outcome['passed']
+        print(f"   [{'OK' if outcome['passed'] else 'FAIL'}] {outcome['rows_candidate']} righe, errori: {outcome['column_errors']}, "
+              f"decisioni diverse: {len(outcome['decision_mismatches'])}")
+
+        vol_engine, rates_engine, div_engine, df_spot = recorded
+        start = max(df_spot['AsOfDate'].min(), vol_engine.available_dates().min())
+        initial_spot = df_spot[df_spot['AsOfDate'] >= start]['Spot'].iloc[0]
+        expiries = [e for e in vol_engine.available_expiries() if e > start][:RECORDED_EXPIRIES]
+        real_books = [(e, round(initial_spot * level / 50) * 50) for e in expiries for level in (0.95, 1.00, 1.05)]
+        print("\n[2c] Equivalenza motori (input registrati)")
+        passed &= run_equivalence("recorded", vol_engine, rates_engine, div_engine, df_spot, real_books, ticks_done, seconds)
+
+    # 3. THROUGHPUT (ticks/s) vs baseline
+    print("\n[3] Throughput")
+    measured = {name: ticks_done[name] / seconds[name] for name in ticks_done if seconds[name] > 0}
+    perf = check_throughput(measured, BASELINE_PATH, THROUGHPUT_TOLERANCE, update=update_baseline)
+    passed &= perf['passed']
+    for name, tps in sorted(measured.items()):
+        base = perf['baseline'].get(name)
+        flag = "FAIL" if name in perf['failures'] else "OK"
+        print(f"   [{flag}] {name:<24} {tps:12.0f} ticks/s" + (f" (baseline {base:.0f})" if base else " (nessuna baseline)"))
+    if update_baseline:
+        print(f"   Baseline aggiornata: {BASELINE_PATH}")
+
+    elapsed = time.time() - start_time
+    print(f"\n--- GATE {'SUPERATO' if passed else 'FALLITO'} in {elapsed:.2f}s ---")
+    return passed
+
+if __name__ == "__main__":
+    sys.exit(0 if run_regression_gate() else 1)
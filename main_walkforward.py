@@ -0,0 +1,81 @@
+import pandas as pd
+import numpy as np
+import time
+import os
+
+from src.data_loaders import load_volatility_engine, RatesManager, DividendsManager
+from src.greeks_engine import precompute_book_greeks
+from src.walkforward import day_start_positions, whalley_multi_start
+
+# CONFIGURAZIONI
+MONEYNESS_LEVELS = {'ITM': 0.95, 'ATM': 1.00, 'OTM': 1.05}
+START_EVERY_N_DAYS = 1   # Apertura del book ogni N giorni di trading
+OUTPUT_DIR = "results_walkforward"
+
+def ensure_dir(directory):
+    if not os.path.exists(directory):
+        os.makedirs(directory)
+
+def run_walkforward():
+    start_time = time.time()
+    print(f"--- AVVIO WALK-FORWARD WHALLEY (ROLLING START) ---")
+
+    try:
+        vol_engine = load_volatility_engine("data/iv_surface_empirical_anchored.parquet")
+        rates_engine = RatesManager("data/daily_rates_linear_smoothed_long.parquet")
+        div_engine = DividendsManager("data/dividends.parquet")
+    except FileNotFoundError as e:
+        print(f"ERRORE FATALE MOTORI: {e}")
+        return
+
+    print("Caricamento Spot Prices...")
+    df_spot = pd.read_parquet("data/spot_prices_min.parquet")
+    df_spot['AsOfDate'] = pd.to_datetime(df_spot['AsOfDate'])
+    df_spot = df_spot.sort_values("AsOfDate")
+
+    all_expiries = vol_engine.available_expiries()
+    global_start_date = max(df_spot['AsOfDate'].min(), vol_engine.available_dates().min())
+    future_expiries = [e for e in all_expiries if e > global_start_date]
+    initial_spot = df_spot[df_spot['AsOfDate'] >= global_start_date]['Spot'].iloc[0]
+    print(f"Trovate {len(future_expiries)} scadenze future. Apertura ogni {START_EVERY_N_DAYS} giorni.")
+
+    reports = []
+    for i, expiry in enumerate(future_expiries):
+        df_sim = df_spot[(df_spot['AsOfDate'] >= global_start_date) & (df_spot['AsOfDate'] <= expiry)]
+        if len(df_sim) == 0:
+            continue
+
+        for moneyness, level in MONEYNESS_LEVELS.items():
+            # Strike fisso per (scadenza, moneyness): Greeks calcolati una sola volta
+            strike = round(initial_spot * level / 50) * 50
+            greeks = precompute_book_greeks(vol_engine, rates_engine, div_engine, df_sim, expiry, strike)
+            if greeks.empty:
+                continue
+
+            starts = day_start_positions(greeks['timestamp'], START_EVERY_N_DAYS)
+            report = whalley_multi_start(greeks, starts, risk_aversion=1.0, transaction_cost=0.002)
+            report.insert(0, 'Moneyness', moneyness)
+            report.insert(1, 'Expiry', expiry.date())
+            report.insert(2, 'Strike', strike)
+            report['Days_To_Expiry'] = (expiry - pd.to_datetime(report['Start_Date']).dt.normalize()).dt.days
+            reports.append(report)
+            print(f"   [OK] [{i+1}/{len(future_expiries)}] {moneyness}_{expiry.date()}: {len(starts)} partenze")
+
+    if not reports:
+        print("Nessun risultato.")
+        return
+
+    df_final = pd.concat(reports, ignore_index=True)
+    ensure_dir(OUTPUT_DIR)
+    output_path = os.path.join(OUTPUT_DIR, "WALKFORWARD_REPORT.csv")
+    df_final.to_csv(output_path, index=False)
+
+    print("\n--- SENSIBILITÀ ALLA DATA DI APERTURA (per Moneyness) ---")
+    print(df_final.groupby('Moneyness')[['Final_PnL_EUR', 'Total_Costs_EUR', 'PnL_Volatility']].agg(['mean', 'std']))
+
+    elapsed = time.time() - start_time
+    print(f"\nCompletato in {elapsed:.2f}s.")
+    print(f"Salvato in: {output_path} ({len(df_final)} run)")
+
+if __name__ == "__main__":
+    run_walkforward()
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+
+def default_block_size(n):
+    """ Regola n^(1/3) per la lunghezza dei blocchi """
+    return max(1, int(round(n ** (1/3))))
+
+def block_start_matrix(n, n_boot, block_size, rng):
+    """
+    Matrice (n_boot x n_blocks) degli inizi di blocco per il moving-block
+    bootstrap circolare: ogni replicato concatena blocchi consecutivi di
+    lunghezza block_size (mod n), l'ultimo troncato per arrivare a n tick.
+    """
+    n_blocks = -(-n // block_size)
+    return rng.integers(0, n, size=(n_boot, n_blocks))
+
+def _window_sums(x, length):
+    """ Somme circolari di x su finestre di lunghezza 'length' che partono da ogni indice """
+    n = len(x)
+    c = np.concatenate([[0.0], np.cumsum(np.concatenate([x, x[:length]]))])
+    return c[length:length + n] - c[:n]
+
+def _replicate_sums(x, starts, block_size):
+    """
+    Somma di x su ogni replicato senza materializzare la matrice (n_boot x n):
+    somme di blocco precalcolate (prefix sum) indicizzate con gli inizi.
+    """
+    n = len(x)
+    last_len = n - (starts.shape[1] - 1) * block_size
+    full = _window_sums(x, block_size)[starts[:, :-1]].sum(axis=1)
+    return full + _window_sums(x, last_len)[starts[:, -1]]
+
+def _replicate_std(x, starts, block_size):
+    n = len(x)
+    s1 = _replicate_sums(x, starts, block_size)
+    s2 = _replicate_sums(x ** 2, starts, block_size)
+    return np.sqrt(np.maximum(s2 - s1 ** 2 / n, 0.0) / (n - 1))
+
+def pnl_increments(df):
+    """ Incrementi tick-by-tick del P&L (Cash + Azioni*Spot - Opzione) """
+    pnl = df['Cash'] + df['Held_Shares'] * df['Spot'] - df['Option_Value']
+    return pnl.diff().to_numpy()[1:]
+
+def _percentile_ci(reps, alpha):
+    return np.percentile(reps, [100 * alpha / 2, 100 * (1 - alpha / 2)])
+
+def bootstrap_kpis(df, n_boot=2000, block_size=None, alpha=0.05, seed=0):
+    """
+    Intervalli di confidenza (percentili) per Final_PnL_EUR e PnL_Volatility
+    ricampionando a blocchi gli incrementi di P&L, e per Delta_Tracking_Error
+    ricampionando la deviazione |Held_Shares - Ideal_Delta| su tutte le righe
+    (stessa statistica di calculate_kpi), con una propria matrice di inizi.
+    Senza Ideal_Delta (come in calculate_kpi) il CI del tracking error è omesso.
+    """
+    if not all(col in df.columns for col in ['Cash', 'Held_Shares', 'Spot', 'Option_Value']):
+        return {}
+    dpnl = pnl_increments(df)
+    n = len(dpnl)
+    if n < 2:
+        return {}
+
+    rng = np.random.default_rng(seed)
+    block_size = min(block_size or default_block_size(n), n)
+    starts = block_start_matrix(n, n_boot, block_size, rng)
+    replicates = [('Final_PnL_EUR', _replicate_sums(dpnl, starts, block_size)),
+                  ('PnL_Volatility', _replicate_std(dpnl, starts, block_size))]
+
+    if 'Ideal_Delta' in df.columns:
+        dev = (df['Held_Shares'] - df['Ideal_Delta']).abs().to_numpy()
+        n_dev = len(dev)
+        dev_block = min(block_size, n_dev)
+        dev_starts = block_start_matrix(n_dev, n_boot, dev_block, rng)
+        replicates.append(('Delta_Tracking_Error', _replicate_sums(dev, dev_starts, dev_block) / n_dev))
+
+    result = {}
+    for name, reps in replicates:
+        low, high = _percentile_ci(reps, alpha)
+        result[f'{name}_CI_Low'] = low
+        result[f'{name}_CI_High'] = high
+    return result
+
+def paired_bootstrap_test(df_a, df_b, n_boot=2000, block_size=None, alpha=0.05, seed=0):
+    """
+    Test a coppie A - B sugli stessi tick (allineati per timestamp): i due
+    run vengono ricampionati con gli stessi blocchi, così la differenza
+    conserva la correlazione dovuta al percorso comune dello spot.
+    p-value bilaterale = 2 * min(P(diff <= 0), P(diff >= 0)).
+    """
+    cols = ['timestamp', 'Cash', 'Held_Shares', 'Spot', 'Option_Value']
+    if not all(col in df.columns for df in (df_a, df_b) for col in cols):
+        return {}
+    merged = pd.merge(df_a[cols], df_b[cols], on='timestamp', suffixes=('_a', '_b'))
+    if len(merged) < 3:
+        return {}
+
+    def side(suffix):
+        return merged[[f'{c}{suffix}' for c in cols[1:]]].set_axis(cols[1:], axis=1)
+
+    da = pnl_increments(side('_a'))
+    db = pnl_increments(side('_b'))
+    n = len(da)
+    block_size = min(block_size or default_block_size(n), n)
+    starts = block_start_matrix(n, n_boot, block_size, np.random.default_rng(seed))
+
+    diff_pnl = _replicate_sums(da - db, starts, block_size)
+    diff_vol = _replicate_std(da, starts, block_size) - _replicate_std(db, starts, block_size)
+
+    result = {}
+    for name, point, reps in [('Final_PnL', da.sum() - db.sum(), diff_pnl),
+                              ('PnL_Volatility', da.std(ddof=1) - db.std(ddof=1), diff_vol)]:
+        low, high = _percentile_ci(reps, alpha)
+        result[f'Paired_{name}_Diff'] = point
+        result[f'Paired_{name}_Diff_CI_Low'] = low
+        result[f'Paired_{name}_Diff_CI_High'] = high
+        result[f'Paired_{name}_P_Value'] = min(1.0, 2 * min((reps <= 0).mean(), (reps >= 0).mean()))
+    return result
@@ -1,5 +1,15 @@
+import os
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+IV_RENAME_MAP = {
+    'Expiry': 'expiry_date',
+    'Strike': 'strike',
+    'IV': 'iv',
+    'Moneyness': 'moneyness'
+}
 
 class VolatilityManager:
     def __init__(self, filepath):
@@ -9,13 +19,7 @@ class VolatilityManager:
         self.df = pd.read_parquet(filepath)
         
         # 2. NORMALIZZAZIONE NOMI COLONNE
-        rename_map = {
-            'Expiry': 'expiry_date',
-            'Strike': 'strike',
-            'IV': 'iv',
-            'Moneyness': 'moneyness'
-        }
-        self.df = self.df.rename(columns=rename_map)
+        self.df = self.df.rename(columns=IV_RENAME_MAP)
         
         # 3. CONVERSIONE DATE
         self.df['AsOfDate'] = pd.to_datetime(self.df['AsOfDate'])
@@ -49,6 +53,174 @@ class VolatilityManager:
         except Exception:
             return None
 
+    def available_dates(self):
+        return self.df.index.get_level_values('AsOfDate').unique().sort_values()
+
+    def available_expiries(self):
+        return self.df.index.get_level_values('expiry_date').unique().sort_values()
+
+def build_iv_partitions(source_path, output_dir, batch_size=500_000):
+    """
+    Converte la superficie IV monolitica in file mensili (iv_YYYY-MM.parquet),
+    ordinati e con un row group per AsOfDate, più un indice '_index.parquet'
+    con (AsOfDate, expiry_date, partition, row_group). Nei metadati dell'indice
+    restano percorso e mtime della sorgente, per riconoscere partizioni stale.
+    La memoria è limitata a un batch in lettura e a un mese in riscrittura.
+    """
+    source_mtime = os.path.getmtime(source_path)
+    os.makedirs(output_dir, exist_ok=True)
+    # Partizioni di una build precedente (mesi che potrebbero non esistere più)
+    for name in os.listdir(output_dir):
+        if name.startswith("iv_") and name.endswith(".parquet"):
+            os.remove(os.path.join(output_dir, name))
+    raw_dir = os.path.join(output_dir, "_raw")
+    os.makedirs(raw_dir, exist_ok=True)
+    print(f"Partizionamento superficie: {source_path} -> {output_dir}")
+
+    # 1. PASSATA IN STREAMING: smista i batch per mese
+    writers = {}
+    try:
+        for batch in pq.ParquetFile(source_path).iter_batches(batch_size=batch_size):
+            chunk = batch.to_pandas().rename(columns=IV_RENAME_MAP)
+            chunk['AsOfDate'] = pd.to_datetime(chunk['AsOfDate'])
+            chunk['expiry_date'] = pd.to_datetime(chunk['expiry_date'])
+            for month, part in chunk.groupby(chunk['AsOfDate'].dt.strftime('%Y-%m')):
+                table = pa.Table.from_pandas(part, preserve_index=False)
+                if month not in writers:
+                    writers[month] = pq.ParquetWriter(os.path.join(raw_dir, f"iv_{month}.parquet"), table.schema)
+                writers[month].write_table(table)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    # 2. RISCRITTURA PER MESE: ordinamento e un row group per giorno
+    index_rows = []
+    for month in sorted(writers):
+        raw_path = os.path.join(raw_dir, f"iv_{month}.parquet")
+        df_month = pd.read_parquet(raw_path).sort_values(by=['AsOfDate', 'expiry_date', 'strike'])
+        filename = f"iv_{month}.parquet"
+        writer = None
+        for row_group, (day, day_df) in enumerate(df_month.groupby('AsOfDate', sort=True)):
+            table = pa.Table.from_pandas(day_df, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(os.path.join(output_dir, filename), table.schema)
+            writer.write_table(table)
+            for expiry in day_df['expiry_date'].unique():
+                index_rows.append((day, expiry, filename, row_group))
+        writer.close()
+        os.remove(raw_path)
+    os.rmdir(raw_dir)
+
+    index = pd.DataFrame(index_rows, columns=['AsOfDate', 'expiry_date', 'partition', 'row_group'])
+    table = pa.Table.from_pandas(index, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b'source_path': os.path.abspath(source_path).encode(),
+        b'source_mtime': repr(source_mtime).encode()
+    })
+    pq.write_table(table, os.path.join(output_dir, "_index.parquet"))
+    print(f"   Scritte {len(writers)} partizioni mensili, {index['AsOfDate'].nunique()} giorni.")
+    return index
+
+class PartitionedVolatilityManager:
+    def __init__(self, directory, window_days: int = 0):
+        """
+        Superficie IV caricata on-demand da partizioni mensili (vedi build_iv_partitions).
+        In memoria resta solo l'indice (giorni/scadenze disponibili) e i giorni
+        della finestra attiva: quando la simulazione chiede il giorno D, i giorni
+        fuori da [D - window_days, D] vengono rilasciati (anche quelli successivi
+        a D, lasciati da un run precedente).
+        Con window_days = 0 ogni run che riparte dall'inizio rilegge i suoi
+        giorni (letture = run x giorni, vedi 'loads'): è il prezzo della memoria
+        limitata. Una finestra che copre tutta la storia legge ogni giorno una
+        volta sola, con la memoria del VolatilityManager monolitico.
+        Stessa interfaccia di VolatilityManager per get_interpolated_iv.
+        """
+        print(f"Loading Volatility Index: {directory}")
+        self.directory = directory
+        self.window_days = window_days
+
+        self.index = pd.read_parquet(os.path.join(directory, "_index.parquet"))
+        self.index['AsOfDate'] = pd.to_datetime(self.index['AsOfDate'])
+        self.index['expiry_date'] = pd.to_datetime(self.index['expiry_date'])
+        # Un row group per giorno: (partition, row_group) per AsOfDate
+        self.day_locations = self.index.drop_duplicates('AsOfDate').set_index('AsOfDate')[['partition', 'row_group']]
+
+        self.cache = {}
+        self.loads = 0
+        self.peak_cached_days = 0
+
+        dates = self.available_dates()
+        print(f"   Indice caricato. Date: da {dates.min().date()} a {dates.max().date()} ({len(dates)} giorni)")
+
+    def available_dates(self):
+        return pd.DatetimeIndex(self.day_locations.index).sort_values()
+
+    def available_expiries(self):
+        return pd.DatetimeIndex(self.index['expiry_date'].unique()).sort_values()
+
+    def evict_outside(self, first, last):
+        """ Rilascia i giorni fuori da [first, last] (anche quelli successivi: un run che riparte dall'inizio) """
+        for day in [d for d in self.cache if d < first or d > last]:
+            del self.cache[day]
+
+    def _load_day(self, date):
+        if date in self.cache:
+            return self.cache[date]
+        if date not in self.day_locations.index:
+            return None
+
+        self.evict_outside(date - pd.Timedelta(days=self.window_days), date)
+
+        partition, row_group = self.day_locations.loc[date]
+        day_df = pq.ParquetFile(os.path.join(self.directory, partition)).read_row_group(
+            int(row_group), columns=['expiry_date', 'strike', 'iv']).to_pandas()
+        day_df['expiry_date'] = pd.to_datetime(day_df['expiry_date'])
+
+        # Per scadenza: array di strike (ordinati) e IV
+        surface = {expiry: (grp['strike'].to_numpy(), grp['iv'].to_numpy())
+                   for expiry, grp in day_df.groupby('expiry_date', sort=False)}
+        self.cache[date] = surface
+        self.loads += 1
+        self.peak_cached_days = max(self.peak_cached_days, len(self.cache))
+        return surface
+
+    def get_interpolated_iv(self, current_date, expiry_date, target_strike):
+        """ Strike più vicino sulla superficie del giorno (come VolatilityManager) """
+        try:
+            surface = self._load_day(pd.Timestamp(current_date))
+            if surface is None or expiry_date not in surface:
+                return None
+            strikes, ivs = surface[expiry_date]
+            return ivs[np.abs(strikes - target_strike).argmin()]
+        except Exception:
+            return None
+
+def partition_source(partition_dir):
+    """ (percorso, mtime) della sorgente registrati nell'indice, None se assenti """
+    metadata = pq.read_schema(os.path.join(partition_dir, "_index.parquet")).metadata or {}
+    if b'source_path' not in metadata or b'source_mtime' not in metadata:
+        return None
+    return metadata[b'source_path'].decode(), float(metadata[b'source_mtime'])
+
+def load_volatility_engine(filepath, partition_dir="data/iv_partitions", window_days: int = 0):
+    """
+    Usa la superficie partizionata se esiste, altrimenti il parquet monolitico.
+    Se le partizioni non vengono da 'filepath' o sono più vecchie della sua
+    ultima modifica, vengono ricostruite prima dell'uso.
+    """
+    if not os.path.exists(os.path.join(partition_dir, "_index.parquet")):
+        return VolatilityManager(filepath)
+
+    if os.path.exists(filepath):
+        source = partition_source(partition_dir)
+        current = (os.path.abspath(filepath), os.path.getmtime(filepath))
+        if source != current:
+            print(f"ATTENZIONE: partizioni in {partition_dir} non aggiornate rispetto a {filepath} "
+                  f"(sorgente registrata: {source}). Ricostruzione...")
+            build_iv_partitions(filepath, partition_dir)
+    return PartitionedVolatilityManager(partition_dir, window_days=window_days)
+
 class RatesManager:
     def __init__(self, filepath):
         print(f"Loading Rates: {filepath}")
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from src.models import pbs_greeks_vec
+from src.strategy import WhalleyHedgingStrategy, whalley_bandwidth_vec
+
+YEAR_SECONDS = 365.25 * 24 * 3600
+MIN_T = 0.0001
+
+def spot_triggers(S, shares, strike, T, r, q, iv, strategy, grid_width=0.15, grid_points=257):
+    """
+    Livelli di spot (sotto/sopra S) oltre i quali 'shares' esce da
+    [Delta - H, Delta + H] con r, q, IV fissati.
+    T e r possono essere array (es. inizio e fine finestra): un punto di
+    griglia è "fuori" se la banda è rotta per almeno uno dei valori, così i
+    trigger coprono anche la deriva temporale della banda nella finestra.
+    La banda viene valutata su una griglia log-spot; il trigger è l'ultimo punto
+    di griglia ancora dentro la banda prima del primo punto fuori, quindi è
+    conservativo: lo spot può solo raggiungere il trigger prima della rottura.
+    Se non c'è rottura nella griglia il trigger è il bordo della griglia.
+    """
+    grid = S * np.exp(np.linspace(-grid_width, grid_width, grid_points))
+    T = np.atleast_1d(T)[:, None]
+    r = np.atleast_1d(r)[:, None]
+    _, delta, gamma = pbs_greeks_vec(grid * np.exp(-q * T), strike, T, r, 0.0, iv)
+    H = whalley_bandwidth_vec(grid, T, gamma, strategy.gamma, strategy.epsilon)
+    outside = ((shares < delta - H) | (shares > delta + H)).any(axis=0)
+
+    mid = grid_points // 2
+    if outside[mid]:
+        # La banda esce dallo spot attuale entro la finestra (deriva in T):
+        # qualunque tick successivo è candidato
+        return S, S
+    up = np.flatnonzero(outside[mid + 1:])
+    down = np.flatnonzero(outside[:mid][::-1])
+    trigger_up = grid[mid + up[0]] if len(up) else grid[-1]
+    trigger_down = grid[mid - down[0]] if len(down) else grid[0]
+    return trigger_down, trigger_up
+
+def run_whalley_event_driven(vol_engine, rates_engine, div_engine, df_sim, expiry_date, strike,
+                             risk_aversion: float = 1.0, transaction_cost: float = 0.002):
+    """
+    Whalley in modalità event-driven: invece di valutare i Greeks a ogni minuto
+    salta direttamente al prossimo tick in cui lo spot attraversa i trigger
+    calcolati dopo l'ultimo evento (confronto vettoriale sull'array degli spot).
+    I trigger valgono fino a un tick j (fine giornata): la banda è valutata al
+    T di inizio e di fine finestra. Dove i trigger non si possono limitare si
+    valuta ogni tick:
+      - se la deriva di T rompe già la banda allo spot attuale (tipicamente
+        subito dopo un trade, che porta le azioni sul bordo), la finestra viene
+        dimezzata; se resta rotta anche al tick successivo, quel tick è candidato;
+      - nell'ultimo giorno prima della scadenza (meno di un giorno a scadenza),
+        dove la banda cambia troppo in fretta con T: Greeks di tutti i tick
+        del giorno in blocco e controllo della banda tick per tick.
+    Un candidato che non rompe la banda ricalcola solo i trigger.
+
+    Il log contiene le righe di inizio giorno e i trade (stesse colonne di
+    WhalleyHedgingStrategy); il conteggio delle valutazioni è in 'evaluations'.
+    """
+    strat = WhalleyHedgingStrategy(risk_aversion=risk_aversion, transaction_cost=transaction_cost)
+    strat.evaluations = 0
+
+    times = pd.to_datetime(df_sim['AsOfDate']).reset_index(drop=True)
+    spots = df_sim['Spot'].to_numpy(dtype=float)
+    T = (expiry_date - times).dt.total_seconds().to_numpy() / YEAR_SECONDS
+    expired = np.flatnonzero(T <= MIN_T)
+    n = expired[0] if len(expired) else len(T)
+
+    day_values = times.dt.normalize().to_numpy()[:n]
+    unique_days = np.unique(day_values)
+    day_starts = np.searchsorted(day_values, unique_days)
+    day_ends = np.r_[day_starts[1:], n]
+
+    def evaluate(i, q, r_i, iv):
+        strat.evaluations += 1
+        spot_adj = spots[i] * np.exp(-q * T[i])
+        price, delta, gamma = pbs_greeks_vec(spot_adj, strike, T[i], r_i, 0.0, iv)
+        return float(price), float(delta), float(gamma)
+
+    def check(i, r_i, price, delta, gamma):
+        H = strat.calculate_bandwidth(spots[i], T[i], r_i, gamma)
+        if strat.current_shares > delta + H or strat.current_shares < delta - H:
+            strat.rebalance(times[i], spots[i], T[i], r_i, delta, gamma, price)
+
+    def triggers_until(i, j, r, start, q, iv):
+        return spot_triggers(spots[i], strat.current_shares, strike,
+                             T[[i, j]], r[[i - start, j - start]], q, iv, strat)
+
+    for day, start, end in zip(unique_days, day_starts, day_ends):
+        today_date = pd.Timestamp(day)
+        iv = vol_engine.get_interpolated_iv(today_date, expiry_date, strike)
+        if iv is None or not iv > 0:
+            continue
+        q = div_engine.get_yield_q(today_date)
+        r = np.broadcast_to(rates_engine.get_risk_free_rate(today_date, T[start:end] * 365.25),
+                            (end - start,))
+
+        # Inizio giorno: valutazione e rebalance (sempre a log)
+        i = start
+        price, delta, gamma = evaluate(i, q, r[0], iv)
+        strat.rebalance(times[i], spots[i], T[i], r[0], delta, gamma, price)
+
+        if T[end - 1] * 365.25 < 1.0:
+            # Ultimo giorno prima della scadenza: ogni tick
+            prices, deltas, gammas = pbs_greeks_vec(spots[start + 1:end] * np.exp(-q * T[start + 1:end]),
+                                                    strike, T[start + 1:end], r[1:], 0.0, iv)
+            strat.evaluations += end - start - 1
+            for k, i in enumerate(range(start + 1, end)):
+                check(i, r[i - start], float(prices[k]), float(deltas[k]), float(gammas[k]))
+            continue
+
+        while i < end - 1:
+            j = end - 1
+            trigger_down, trigger_up = triggers_until(i, j, r, start, q, iv)
+            # Banda già rotta allo spot attuale entro j (deriva di T): finestra dimezzata
+            while trigger_down == trigger_up and j > i + 1:
+                j = (i + j) // 2
+                trigger_down, trigger_up = triggers_until(i, j, r, start, q, iv)
+
+            window = spots[i + 1:j + 1]
+            hit = (window <= trigger_down) | (window >= trigger_up)
+            if not hit.any():
+                # Nessun attraversamento fino a j: i trigger ripartono da j
+                i = j
+                continue
+            i = i + 1 + int(hit.argmax())
+            check(i, r[i - start], *evaluate(i, q, r[i - start], iv))
+
+    return strat
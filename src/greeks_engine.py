@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+from src.models import pbs_greeks_vec
+
+YEAR_SECONDS = 365.25 * 24 * 3600
+MIN_T = 0.0001
+
+
+def precompute_book_greeks(vol_engine, rates_engine, div_engine, df_sim, expiry_date, strike):
+    """
+    Calcola in blocco (per giorno) i Greeks di un singolo book (expiry, strike)
+    su tutti i tick di df_sim, replicando la logica del loop per-tick dei main:
+      - T per tick, stop al primo T <= 0.0001
+      - q e IV fissati per giorno, r interpolato sul tenor di ogni tick
+      - spot aggiustato per dividendi, PBS con q = 0
+
+    Restituisce un DataFrame allineato ai tick (fino allo stop) con colonne:
+    timestamp, Spot, T, r, q, iv, Option_Value, Delta, Gamma, Valid.
+    Valid = False dove la IV manca (tick che il loop originale salta).
+    """
+    times = pd.to_datetime(df_sim['AsOfDate']).reset_index(drop=True)
+    spots = df_sim['Spot'].to_numpy(dtype=float)
+
+    T = (expiry_date - times).dt.total_seconds().to_numpy() / YEAR_SECONDS
+
+    # Stop alla prima occorrenza di T <= 0.0001 (come il 'break' del loop)
+    expired = np.flatnonzero(T <= MIN_T)
+    n = expired[0] if len(expired) else len(T)
+    times, spots, T = times.iloc[:n], spots[:n], T[:n]
+
+    r = np.full(n, np.nan)
+    q = np.full(n, np.nan)
+    iv = np.full(n, np.nan)
+
+    days = times.dt.normalize()
+    day_values = days.to_numpy()
+    # Confini dei giorni (i tick sono ordinati per tempo)
+    boundaries = np.flatnonzero(np.r_[True, day_values[1:] != day_values[:-1]])
+    boundaries = np.r_[boundaries, n]
+
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        today_date = days.iloc[start]
+        q[start:end] = div_engine.get_yield_q(today_date)
+        r[start:end] = rates_engine.get_risk_free_rate(today_date, T[start:end] * 365.25)
+
+        day_iv = vol_engine.get_interpolated_iv(today_date, expiry_date, strike)
+        if day_iv is not None and day_iv > 0:
+            iv[start:end] = day_iv
+
+    valid = ~np.isnan(iv)
+    spot_adj = spots * np.exp(-q * T)
+    price, delta, gamma = pbs_greeks_vec(spot_adj, strike, T, r, 0.0, np.where(valid, iv, 0.0))
+
+    return pd.DataFrame({
+        'timestamp': times,
+        'Spot': spots,
+        'T': T,
+        'r': r,
+        'q': q,
+        'iv': iv,
+        'Option_Value': price,
+        'Delta': delta,
+        'Gamma': gamma,
+        'Valid': valid
+    })
+
+def daily_book_greeks(vol_engine, rates_engine, div_engine, df_sim, expiries, strikes):
+    """
+    Greeks di tutti i book (expiry, strike) un giorno alla volta: per ogni
+    giorno di df_sim restituisce (generatore) un blocco con matrici
+    (tick del giorno x book), con la stessa logica di precompute_book_greeks.
+    La memoria cresce con book x tick per giorno, non con l'intera storia.
+
+    Ogni blocco è un dict con: start, end (posizioni in df_sim), T, r, Option_Value,
+    Delta, Gamma, Valid (IV disponibile e non scaduto), Expired (T <= 0.0001).
+    """
+    times = pd.to_datetime(df_sim['AsOfDate']).reset_index(drop=True)
+    spots = df_sim['Spot'].to_numpy(dtype=float)
+    expiries = pd.DatetimeIndex(expiries)
+    strikes = np.asarray(strikes, dtype=float)
+
+    days = times.dt.normalize()
+    day_values = days.to_numpy()
+    boundaries = np.flatnonzero(np.r_[True, day_values[1:] != day_values[:-1]])
+    boundaries = np.r_[boundaries, len(times)]
+
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        today_date = days.iloc[start]
+        # T per (tick, book): i tick sono ordinati, quindi T <= 0.0001 equivale
+        # allo stop del loop per-tick di ogni book
+        seconds = (expiries.to_numpy()[None, :] - times.iloc[start:end].to_numpy()[:, None]) / np.timedelta64(1, 's')
+        T = seconds / YEAR_SECONDS
+        expired = T <= MIN_T
+
+        q = div_engine.get_yield_q(today_date)
+        r = np.broadcast_to(rates_engine.get_risk_free_rate(today_date, T * 365.25), T.shape)
+
+        iv = np.full(len(strikes), np.nan)
+        for j, (expiry_date, strike) in enumerate(zip(expiries, strikes)):
+            if expired[:, j].all():
+                continue
+            day_iv = vol_engine.get_interpolated_iv(today_date, expiry_date, strike)
+            if day_iv is not None and day_iv > 0:
+                iv[j] = day_iv
+
+        valid = ~np.isnan(iv)[None, :] & ~expired
+        spot_adj = spots[start:end, None] * np.exp(-q * T)
+        price, delta, gamma = pbs_greeks_vec(spot_adj, strikes[None, :], T, r, 0.0,
+                                             np.where(valid, iv[None, :], 0.0))
+
+        yield {'start': start, 'end': end, 'T': T, 'r': r, 'Option_Value': price,
+               'Delta': delta, 'Gamma': gamma, 'Valid': valid, 'Expired': expired}
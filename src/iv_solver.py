@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from src.models import pbs_greeks_vec, pbs_vega_vec
+
+YEAR_SECONDS = 365.25 * 24 * 3600
+SIGMA_MIN = 1e-4
+SIGMA_MAX = 5.0
+
+def implied_vol_vec(price, S, K, T, r, q, tol=1e-8, max_iter=100):
+    """
+    Inversione vettoriale della call PBS su array di (price, S, K, T, r, q).
+    Newton con salvaguardia: ogni elemento mantiene un intervallo [lo, hi] che
+    contiene la soluzione; se il passo di Newton esce dall'intervallo (o la vega
+    è troppo piccola) si usa la bisezione.
+    Restituisce NaN dove il prezzo viola i limiti di non-arbitraggio:
+        max(S e^{-qT} - K e^{-rT}, 0) < price < S e^{-qT}
+    e dove la soluzione è fuori da [SIGMA_MIN, SIGMA_MAX] (altrimenti la
+    bisezione convergerebbe al bordo dell'intervallo).
+    """
+    price, S, K, T, r, q = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (price, S, K, T, r, q))
+    )
+    price, S, K, T, r, q = (x.ravel() for x in (price, S, K, T, r, q))
+    iv = np.full(price.shape, np.nan)
+
+    # 1. MASCHERA NON-ARBITRAGGIO
+    fwd_S = S * np.exp(-q * T)
+    lower = np.maximum(fwd_S - K * np.exp(-r * T), 0.0)
+    ok = (T > 0) & (S > 0) & (K > 0) & np.isfinite(price) & (price > lower) & (price < fwd_S)
+    idx = np.flatnonzero(ok)
+    if len(idx) == 0:
+        return iv
+
+    # Prezzo fuori dal range del modello in [SIGMA_MIN, SIGMA_MAX]: nessuna soluzione nell'intervallo
+    p_min, _, _ = pbs_greeks_vec(S[idx], K[idx], T[idx], r[idx], q[idx], SIGMA_MIN)
+    p_max, _, _ = pbs_greeks_vec(S[idx], K[idx], T[idx], r[idx], q[idx], SIGMA_MAX)
+    idx = idx[(price[idx] >= p_min) & (price[idx] <= p_max)]
+    if len(idx) == 0:
+        return iv
+
+    p, s, k, t, rr, qq = price[idx], S[idx], K[idx], T[idx], r[idx], q[idx]
+
+    # 2. INTERVALLO INIZIALE E GUESS (Brenner-Subrahmanyam, clippato)
+    lo = np.full(len(idx), SIGMA_MIN)
+    hi = np.full(len(idx), SIGMA_MAX)
+    sigma = np.clip(np.sqrt(2 * np.pi / t) * p / s, 0.05, 1.0)
+
+    # 3. NEWTON + BISEZIONE solo sugli elementi non ancora convergenti
+    todo = np.arange(len(idx))
+    for _ in range(max_iter):
+        if len(todo) == 0:
+            break
+        sg = sigma[todo]
+        model, _, _ = pbs_greeks_vec(s[todo], k[todo], t[todo], rr[todo], qq[todo], sg)
+        diff = model - p[todo]
+
+        # Il prezzo call è crescente in sigma: aggiorna l'intervallo
+        lo[todo] = np.where(diff < 0, sg, lo[todo])
+        hi[todo] = np.where(diff > 0, sg, hi[todo])
+
+        vega = pbs_vega_vec(s[todo], k[todo], t[todo], rr[todo], qq[todo], sg)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            newton = sg - diff / vega
+        use_newton = (vega > 1e-12) & (newton > lo[todo]) & (newton < hi[todo])
+        new_sigma = np.where(use_newton, newton, 0.5 * (lo[todo] + hi[todo]))
+        sigma[todo] = new_sigma
+
+        # Convergenza sul passo in sigma (non sul prezzo: deep ITM/OTM la vega è minima)
+        converged = (diff == 0) | (np.abs(new_sigma - sg) < tol) | (hi[todo] - lo[todo] < tol)
+        todo = todo[~converged]
+
+    # Elementi non convergenti entro max_iter restano NaN
+    solved = np.ones(len(idx), dtype=bool)
+    solved[todo] = False
+    iv[idx[solved]] = sigma[solved]
+    return iv
+
+def build_iv_surface(quotes, rates_engine=None, div_engine=None):
+    """
+    Costruisce una superficie IV dalle quotazioni di call.
+    quotes: DataFrame con AsOfDate, Expiry, Strike, Price, Spot e opzionalmente r, q
+    (altrimenti presi da RatesManager / DividendsManager per giorno).
+    Output nello schema letto da VolatilityManager:
+        AsOfDate, Expiry, Strike, IV, Moneyness (= Strike / Spot)
+    Le quotazioni che violano i limiti di non-arbitraggio vengono scartate.
+    Le IV sono calcolate al timestamp della quotazione (T intraday), ma
+    VolatilityManager cerca le superfici per giorno: per ogni punto
+    (giorno, Expiry, Strike) resta l'ultimo snapshot del giorno e AsOfDate
+    viene normalizzato alla data. Ricostruire la superficie in giornata
+    aggiorna quindi la superficie di quel giorno.
+    """
+    df = quotes.copy()
+    df['AsOfDate'] = pd.to_datetime(df['AsOfDate'])
+    df['Expiry'] = pd.to_datetime(df['Expiry'])
+    T = (df['Expiry'] - df['AsOfDate']).dt.total_seconds().to_numpy() / YEAR_SECONDS
+
+    if 'q' not in df.columns:
+        if div_engine is None:
+            raise ValueError("Serve la colonna 'q' o un DividendsManager")
+        days = df['AsOfDate'].dt.normalize()
+        q_by_day = {d: div_engine.get_yield_q(d) for d in days.unique()}
+        df['q'] = days.map(q_by_day).to_numpy()
+
+    if 'r' not in df.columns:
+        if rates_engine is None:
+            raise ValueError("Serve la colonna 'r' o un RatesManager")
+        days = df['AsOfDate'].dt.normalize()
+        r = np.empty(len(df))
+        for day, pos in days.groupby(days).indices.items():
+            r[pos] = rates_engine.get_risk_free_rate(day, T[pos] * 365.25)
+        df['r'] = r
+
+    df['IV'] = implied_vol_vec(df['Price'].to_numpy(), df['Spot'].to_numpy(), df['Strike'].to_numpy(),
+                               T, df['r'].to_numpy(), df['q'].to_numpy())
+
+    n_quotes = len(df)
+    df = df.dropna(subset=['IV'])
+    print(f"   IV calcolate: {len(df)}/{n_quotes} quotazioni valide ({n_quotes - len(df)} scartate)")
+
+    # Ultimo snapshot del giorno per punto; più quotazioni nello stesso snapshot: media
+    df['Moneyness'] = df['Strike'] / df['Spot']
+    df['Day'] = df['AsOfDate'].dt.normalize()
+    latest = df.groupby(['Day', 'Expiry', 'Strike'])['AsOfDate'].transform('max')
+    df = df[df['AsOfDate'] == latest]
+    surface = (df.groupby(['Day', 'Expiry', 'Strike'], as_index=False)
+                 .agg(IV=('IV', 'mean'), Moneyness=('Moneyness', 'mean'))
+                 .rename(columns={'Day': 'AsOfDate'}))
+    return surface.sort_values(by=['AsOfDate', 'Expiry', 'Strike']).reset_index(drop=True)
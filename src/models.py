@@ -25,4 +25,48 @@ def pbs_price(S, K, T, r, q, sigma):
     
     # Formula Call: S * e^(-qT) * N(d1) - K * e^(-rT) * N(d2)
     price = S * np.exp(-q * T) * norm.cdf(d1) - K * np.exp(-r * T) * norm.cdf(d2)
-    return price
\ No newline at end of file
+    return price
+
+def pbs_greeks_vec(S, K, T, r, q, sigma):
+    """
+    Versione vettoriale di pbs_price / pbs_delta / pbs_gamma.
+    Accetta array NumPy (broadcast) e restituisce (prezzo, delta, gamma).
+    Dove T <= 0 o sigma <= 0 replica i casi limite scalari:
+    prezzo = payoff intrinseco, delta = 0, gamma = 0.
+    """
+    S, K, T, r, q, sigma = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (S, K, T, r, q, sigma))
+    )
+    valid = (T > 0) & (sigma > 0)
+
+    # Valori "sicuri" dove il punto non è valido (evita warning log/0)
+    T_safe = np.where(valid, T, 1.0)
+    sig_safe = np.where(valid, sigma, 1.0)
+    sqrt_T = np.sqrt(T_safe)
+
+    d1 = (np.log(S / K) + (r - q + 0.5 * sig_safe ** 2) * T_safe) / (sig_safe * sqrt_T)
+    d2 = d1 - sig_safe * sqrt_T
+
+    price = S * np.exp(-q * T_safe) * norm.cdf(d1) - K * np.exp(-r * T_safe) * norm.cdf(d2)
+    delta = norm.cdf(d1)
+    gamma = norm.pdf(d1) / (S * sig_safe * sqrt_T)
+
+    price = np.where(valid, price, np.maximum(S - K, 0.0))
+    delta = np.where(valid, delta, 0.0)
+    gamma = np.where(valid, gamma, 0.0)
+    return price, delta, gamma
+
+
+def pbs_vega_vec(S, K, T, r, q, sigma):
+    """ Vega vettoriale (per unità di volatilità), 0 dove T <= 0 o sigma <= 0 """
+    S, K, T, r, q, sigma = np.broadcast_arrays(
+        *(np.asarray(x, dtype=float) for x in (S, K, T, r, q, sigma))
+    )
+    valid = (T > 0) & (sigma > 0)
+    T_safe = np.where(valid, T, 1.0)
+    sig_safe = np.where(valid, sigma, 1.0)
+    sqrt_T = np.sqrt(T_safe)
+
+    d1 = (np.log(S / K) + (r - q + 0.5 * sig_safe ** 2) * T_safe) / (sig_safe * sqrt_T)
+    vega = S * np.exp(-q * T_safe) * norm.pdf(d1) * sqrt_T
+    return np.where(valid, vega, 0.0)
@@ -0,0 +1,239 @@
+import numpy as np
+import pandas as pd
+
+from src.strategy import WhalleyHedgingStrategy, whalley_bandwidth_vec
+
+
+class PortfolioHedger:
+    def __init__(self, book_ids, strikes, risk_aversion: float, transaction_cost: float,
+                 positions=None, initial_cash: float = 0.0):
+        """
+        Hedger di portafoglio con netting del delta tra book sullo stesso sottostante.
+        Ogni tick aggrega Delta/Gamma di tutti i book (vettori NumPy) e applica
+        una banda Whalley sull'esposizione netta (bandwidth calcolata sul Gamma
+        aggregato). I gap opposti tra book vengono incrociati internamente
+        (a costo zero, allo spot) e i fill di mercato attribuiti pro-quota sul
+        gap residuo.
+
+        In parallelo simula, sempre vettorizzato, l'hedging stand-alone di ogni
+        book (una banda Whalley per book) e un hedge netto con banda pari alla
+        somma delle bande stand-alone: il confronto con quest'ultimo misura il
+        solo effetto del netting, a parità di banda totale.
+
+        strikes: strike per book (regolamento a payoff alla scadenza).
+        positions: numero di opzioni per book (default 1.0 = una short call).
+        """
+        self.book_ids = list(book_ids)
+        self.strikes = np.asarray(strikes, dtype=float)
+        n_books = len(self.book_ids)
+
+        self.gamma = risk_aversion
+        self.epsilon = transaction_cost
+        self.positions = np.ones(n_books) if positions is None else np.asarray(positions, dtype=float)
+
+        # La banda netta usa la stessa formula della strategia per singolo book
+        self.band = WhalleyHedgingStrategy(risk_aversion, transaction_cost)
+
+        # Stato netto (portafoglio)
+        self.current_shares = 0.0
+        self.cash = initial_cash
+
+        # Attribuzione per book
+        self.book_shares = np.zeros(n_books)
+        self.book_cash = np.zeros(n_books)
+        self.book_costs = np.zeros(n_books)
+        self.book_fills = np.zeros(n_books, dtype=int)
+        self.book_option_value = np.zeros(n_books)
+        self.book_payoff = np.zeros(n_books)
+        self.settled = np.zeros(n_books, dtype=bool)
+
+        # Benchmark stand-alone (ogni book si copre da solo)
+        self.standalone_shares = np.zeros(n_books)
+        self.standalone_cash = np.zeros(n_books)
+        self.standalone_costs = np.zeros(n_books)
+        self.standalone_trades = np.zeros(n_books, dtype=int)
+
+        # Benchmark a parità di banda (netto, H = somma delle H stand-alone)
+        self.equal_band_shares = 0.0
+        self.equal_band_cash = initial_cash
+        self.equal_band_costs = 0.0
+        self.equal_band_trades = 0
+
+        self.trade_log = []
+
+    def rebalance(self, timestamp, S, T_rem, r, Delta_PBS, Gamma_PBS, Option_Value, active=None, expired=None):
+        """
+        T_rem, Delta_PBS, Gamma_PBS, Option_Value: array (uno per book).
+        active: maschera dei book vivi in questo tick (IV disponibile, non scaduti).
+        expired: maschera dei book scaduti. Al primo tick dopo la scadenza la
+        short call viene regolata al payoff max(S - K, 0) in cassa e il book esce
+        dal target netto (target 0: le sue azioni vengono smontate).
+        I book né attivi né scaduti (IV mancante) restano congelati.
+        """
+        T_rem = np.asarray(T_rem, dtype=float)
+        Delta_PBS = np.asarray(Delta_PBS, dtype=float)
+        Gamma_PBS = np.asarray(Gamma_PBS, dtype=float)
+        Option_Value = np.asarray(Option_Value, dtype=float)
+        if active is None:
+            active = np.ones(len(self.book_ids), dtype=bool)
+        if expired is None:
+            expired = np.zeros(len(self.book_ids), dtype=bool)
+        active = active & ~expired
+
+        # 0. REGOLAMENTO A SCADENZA (una sola volta per book)
+        settling = expired & ~self.settled
+        if settling.any():
+            payoff = np.where(settling, self.positions * np.maximum(S - self.strikes, 0.0), 0.0)
+            self.book_payoff += payoff
+            self.book_cash -= payoff
+            self.standalone_cash -= payoff
+            self.cash -= payoff.sum()
+            self.equal_band_cash -= payoff.sum()
+            self.settled |= settling
+        self.book_option_value = np.where(active, Option_Value, np.where(expired, 0.0, self.book_option_value))
+
+        live = active | expired
+        book_target = np.where(active, self.positions * Delta_PBS, np.where(expired, 0.0, self.book_shares))
+        book_gamma = np.where(active, self.positions * Gamma_PBS, 0.0)
+
+        # 1. BENCHMARK STAND-ALONE (una banda per book; i book scaduti chiudono, H = 0)
+        H_books = whalley_bandwidth_vec(S, np.where(active, T_rem, 0.0), np.abs(book_gamma), self.gamma, self.epsilon)
+        upper_books = book_target + H_books
+        lower_books = book_target - H_books
+        sa_trade = np.where(self.standalone_shares > upper_books, upper_books - self.standalone_shares,
+                            np.where(self.standalone_shares < lower_books, lower_books - self.standalone_shares, 0.0))
+        sa_trade = np.where(live, sa_trade, 0.0)
+        sa_cost = np.abs(sa_trade * S) * self.epsilon
+        self.standalone_cash += -(sa_trade * S) - sa_cost
+        self.standalone_shares += sa_trade
+        self.standalone_costs += sa_cost
+        self.standalone_trades += (sa_trade != 0)
+
+        # 2. INCROCIO INTERNO: i gap di segno opposto si compensano senza andare a mercato.
+        # Non cambia né le azioni nette né la cassa netta del portafoglio.
+        gap = book_target - self.book_shares
+        long_gap = np.clip(gap, 0.0, None)
+        short_gap = np.clip(-gap, 0.0, None)
+        crossed = min(long_gap.sum(), short_gap.sum())
+        if crossed > 0:
+            transfer = crossed * (long_gap / long_gap.sum() - short_gap / short_gap.sum())
+            self.book_shares += transfer
+            self.book_cash -= transfer * S
+
+        # 3. BANDA WHALLEY SULL'ESPOSIZIONE NETTA
+        target_delta = book_target.sum()
+        net_gamma = abs(book_gamma.sum())
+        T_net = T_rem[active].max() if active.any() else 0.0
+        H = self.band.calculate_bandwidth(S, T_net, r, net_gamma)
+
+        # Benchmark a parità di banda: stesso target netto, H = somma delle H per book
+        H_equal = H_books.sum()
+        eb_trade = 0.0
+        if self.equal_band_shares > target_delta + H_equal:
+            eb_trade = target_delta + H_equal - self.equal_band_shares
+        elif self.equal_band_shares < target_delta - H_equal:
+            eb_trade = target_delta - H_equal - self.equal_band_shares
+        if eb_trade != 0.0:
+            eb_cost = abs(eb_trade * S) * self.epsilon
+            self.equal_band_cash += -(eb_trade * S) - eb_cost
+            self.equal_band_shares += eb_trade
+            self.equal_band_costs += eb_cost
+            self.equal_band_trades += 1
+
+        upper_bound = target_delta + H
+        lower_bound = target_delta - H
+
+        trade_amount = 0.0
+        action = "HOLD"
+
+        if self.current_shares > upper_bound:
+            trade_amount = upper_bound - self.current_shares
+            action = "SELL"
+        elif self.current_shares < lower_bound:
+            trade_amount = lower_bound - self.current_shares
+            action = "BUY"
+
+        cost = 0.0
+        if action != "HOLD":
+            cost = abs(trade_amount * S) * self.epsilon
+            self.cash += (-(trade_amount * S)) - cost
+            self.current_shares += trade_amount
+
+            # 4. ATTRIBUZIONE: dopo l'incrocio i gap residui hanno tutti il segno del trade
+            # e |trade| <= |gap netto|, quindi nessun book riceve più di quanto gli manca.
+            gap = book_target - self.book_shares
+            weights = np.clip(np.sign(trade_amount) * gap, 0.0, None)
+            alloc = trade_amount * weights / weights.sum()
+            alloc_cost = np.abs(alloc * S) * self.epsilon
+
+            self.book_shares += alloc
+            self.book_cash += -(alloc * S) - alloc_cost
+            self.book_costs += alloc_cost
+            self.book_fills += (alloc != 0)
+
+        self.trade_log.append({
+            'timestamp': timestamp,
+            'Spot': S,
+            'Option_Value': float(self.positions @ self.book_option_value),
+            'Ideal_Delta': target_delta,
+            'Net_Gamma': net_gamma,
+            'H_Bandwidth': H,
+            'Held_Shares': self.current_shares,
+            'Action': action,
+            'Trade_Size': trade_amount,
+            'Transaction_Cost': cost,
+            'Cash': self.cash,
+            'Internal_Crossed': crossed,
+            'Standalone_Held_Shares': self.standalone_shares.sum(),
+            'Standalone_Transaction_Cost': sa_cost.sum(),
+            'Equal_Band_Held_Shares': self.equal_band_shares,
+            'Active_Books': int(active.sum()),
+            'Settled_Books': int(self.settled.sum())
+        })
+
+    def get_log_dataframe(self):
+        return pd.DataFrame(self.trade_log)
+
+    def get_book_dataframe(self):
+        """ Attribuzione finale per book: netting vs stand-alone """
+        return pd.DataFrame({
+            'Book': self.book_ids,
+            'Position': self.positions,
+            'Held_Shares': self.book_shares,
+            'Cash': self.book_cash,
+            'Option_Value': self.book_option_value,
+            'Settled': self.settled,
+            'Settlement_Payoff': self.book_payoff,
+            'Fill_Costs': self.book_costs,
+            'Num_Fills': self.book_fills,
+            'Standalone_Held_Shares': self.standalone_shares,
+            'Standalone_Cash': self.standalone_cash,
+            'Standalone_Costs': self.standalone_costs,
+            'Standalone_Trades': self.standalone_trades,
+            'Cost_Saved': self.standalone_costs - self.book_costs
+        })
+
+    def get_netting_summary(self):
+        """
+        Cost_Saved_* confronta con lo stand-alone e include anche l'effetto della
+        banda aggregata (H(somma Gamma) < somma H(Gamma_i)); Netting_Saved_*
+        confronta con l'hedge netto a parità di banda totale e misura il solo netting.
+        """
+        log = self.get_log_dataframe()
+        netted_costs = self.book_costs.sum()
+        standalone_costs = self.standalone_costs.sum()
+        equal_band_costs = self.equal_band_costs
+        return {
+            'Books': len(self.book_ids),
+            'Netted_Costs_EUR': netted_costs,
+            'Standalone_Costs_EUR': standalone_costs,
+            'Cost_Saved_EUR': standalone_costs - netted_costs,
+            'Cost_Saved_Pct': (1 - netted_costs / standalone_costs) * 100 if standalone_costs > 0 else 0.0,
+            'Equal_Band_Costs_EUR': equal_band_costs,
+            'Netting_Saved_EUR': standalone_costs - equal_band_costs,
+            'Netting_Saved_Pct': (1 - equal_band_costs / standalone_costs) * 100 if standalone_costs > 0 else 0.0,
+            'Internal_Crossed_Shares': float(log['Internal_Crossed'].sum()) if not log.empty else 0.0,
+            'Netted_Trades': int((log['Action'] != 'HOLD').sum()) if not log.empty else 0,
+            'Equal_Band_Trades': self.equal_band_trades,
+            'Standalone_Trades': int(self.standalone_trades.sum())
+        }
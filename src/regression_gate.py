@@ -0,0 +1,345 @@
+import os
+import json
+import atexit
+import time
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+
+from src.data_loaders import (VolatilityManager, PartitionedVolatilityManager, RatesManager, DividendsManager,
+                              build_iv_partitions, load_volatility_engine)
+from src.models import pbs_delta, pbs_gamma, pbs_price
+from src.strategy import WhalleyHedgingStrategy
+from src.greeks_engine import precompute_book_greeks
+from src.walkforward import whalley_multi_start
+from src.event_driven import run_whalley_event_driven
+from proprietary_strat.src.strategy_custom import AdaptiveLossStrategy
+
+RISK_AVERSION = 1.0
+TRANSACTION_COST = 0.002
+LAMBDA_CUSTOM = 0.5
+
+# Colonne numeriche confrontate tra motore di riferimento e motori veloci
+LOG_COLUMNS = ['Spot', 'Option_Value', 'Ideal_Delta', 'H_Bandwidth', 'Held_Shares',
+               'Trade_Size', 'Transaction_Cost', 'Cash', 'Loss_Wait_Score', 'Loss_Trade_Score']
+KPI_COLUMNS = ['Total_Costs_EUR', 'Final_PnL_EUR', 'PnL_Volatility', 'Num_Trades',
+               'Trade_Freq_Pct', 'Delta_Tracking_Error', 'Ticks']
+
+# ---------------------------------------------------------------------------
+# INPUT: sintetici (deterministici) o registrati (cartella data/)
+# ---------------------------------------------------------------------------
+
+def make_synthetic_inputs(seed: int = 0, n_days: int = 20, ticks_per_day: int = 120):
+    """
+    Scrive in una cartella temporanea parquet sintetici con lo stesso schema
+    dei dati reali e li carica con i manager standard. La superficie viene
+    anche partizionata (build_iv_partitions) e caricata con
+    PartitionedVolatilityManager, lo store usato dai main quando esiste.
+    Restituisce (vol_engine, rates_engine, div_engine, df_spot, books, partitioned_engine).
+    """
+    rng = np.random.default_rng(seed)
+    directory = tempfile.mkdtemp(prefix="regression_gate_")
+
+    days = pd.bdate_range("2024-11-04", periods=n_days)
+    times = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(d + pd.Timedelta(hours=9, minutes=1), periods=ticks_per_day, freq="min").to_numpy()
+        for d in days]))
+    spots = 4873.0 * np.exp(np.cumsum(rng.normal(0, 0.0006, len(times))))
+    df_spot = pd.DataFrame({'AsOfDate': times, 'Spot': spots})
+    df_spot.to_parquet(os.path.join(directory, "spot.parquet"))
+
+    expiries = [days[-1] + pd.Timedelta(days=1), days[-1] + pd.Timedelta(days=60)]
+    strikes = np.arange(4000, 6000, 50)
+    surface = pd.DataFrame([(d, e, k, 0.15 + 0.1 * abs(np.log(k / 4900)) + rng.normal(0, 0.002), k / 4900)
+                            for d in days for e in expiries for k in strikes],
+                           columns=['AsOfDate', 'Expiry', 'Strike', 'IV', 'Moneyness'])
+    surface.to_parquet(os.path.join(directory, "iv.parquet"))
+
+    rates = pd.DataFrame([(d, tau, 0.03 + 0.0001 * tau / 30) for d in days for tau in [1, 30, 90, 180, 365]],
+                         columns=['AsOfDate', 'tau_days', 'r'])
+    rates.to_parquet(os.path.join(directory, "rates.parquet"))
+    pd.DataFrame({'AsOfDate': days, 'q': 0.02}).to_parquet(os.path.join(directory, "dividends.parquet"))
+
+    vol_engine = VolatilityManager(os.path.join(directory, "iv.parquet"))
+    rates_engine = RatesManager(os.path.join(directory, "rates.parquet"))
+    div_engine = DividendsManager(os.path.join(directory, "dividends.parquet"))
+
+    # Lo store partizionato legge i giorni da disco on-demand: la cartella
+    # temporanea resta fino all'uscita del processo
+    partition_dir = os.path.join(directory, "iv_partitions")
+    build_iv_partitions(os.path.join(directory, "iv.parquet"), partition_dir)
+    partitioned_engine = PartitionedVolatilityManager(partition_dir)
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+
+    books = [(expiry, round(spots[0] * level / 50) * 50) for expiry in expiries for level in (0.95, 1.00, 1.05)]
+    return vol_engine, rates_engine, div_engine, df_spot, books, partitioned_engine
+
+def load_recorded_inputs(data_dir: str = "data"):
+    """
+    Dati reali se presenti (stessi file e stesso caricamento dei main, quindi lo
+    store partizionato se esiste), altrimenti None
+    """
+    try:
+        vol_engine = load_volatility_engine(os.path.join(data_dir, "iv_surface_empirical_anchored.parquet"),
+                                            os.path.join(data_dir, "iv_partitions"))
+        rates_engine = RatesManager(os.path.join(data_dir, "daily_rates_linear_smoothed_long.parquet"))
+        div_engine = DividendsManager(os.path.join(data_dir, "dividends.parquet"))
+        df_spot = pd.read_parquet(os.path.join(data_dir, "spot_prices_min.parquet"))
+    except FileNotFoundError:
+        return None
+    df_spot['AsOfDate'] = pd.to_datetime(df_spot['AsOfDate'])
+    df_spot = df_spot.sort_values("AsOfDate")
+    return vol_engine, rates_engine, div_engine, df_spot
+
+# ---------------------------------------------------------------------------
+# MOTORI: riferimento (loop per-tick dei main) e versioni veloci
+# ---------------------------------------------------------------------------
+
+def reference_loop(strategy_name, vol_engine, rates_engine, div_engine, df_sim, expiry_date, strike):
+    """ Loop per-tick identico a main_batch_backtest / main_proprietary """
+    if strategy_name == 'Whalley':
+        strat = WhalleyHedgingStrategy(risk_aversion=RISK_AVERSION, transaction_cost=TRANSACTION_COST)
+    else:
+        strat = AdaptiveLossStrategy(risk_aversion_weight=LAMBDA_CUSTOM, transaction_cost=TRANSACTION_COST)
+
+    prev_time = None
+    for row in df_sim.itertuples():
+        now = row.AsOfDate
+        spot = row.Spot
+        today_date = pd.Timestamp(now.date())
+
+        T = (expiry_date - now).total_seconds() / (365.25 * 24 * 3600)
+        if T <= 0.0001: break
+
+        if prev_time is None: dt_hours = 1.0/60.0
+        else: dt_hours = (now - prev_time).total_seconds() / 3600.0
+        prev_time = now
+
+        q = div_engine.get_yield_q(today_date)
+        r = rates_engine.get_risk_free_rate(today_date, T * 365.25)
+        iv = vol_engine.get_interpolated_iv(today_date, expiry_date, strike)
+
+        if iv is not None and iv > 0:
+            spot_adj = spot * np.exp(-q * T)
+            delta = pbs_delta(spot_adj, strike, T, r, 0, iv)
+            gamma = pbs_gamma(spot_adj, strike, T, r, 0, iv)
+            opt_price = pbs_price(spot_adj, strike, T, r, 0, iv)
+            if strategy_name == 'Whalley':
+                strat.rebalance(now, spot, T, r, delta, gamma, opt_price)
+            else:
+                strat.rebalance(timestamp=now, S=spot, T_rem=T, r=r, Delta_PBS=delta, Gamma_PBS=gamma,
+                                Volatility_IV=iv, dt_hours=dt_hours, Option_Value=opt_price)
+
+    return strat.get_log_dataframe()
+
+def precomputed_loop(strategy_name, vol_engine, rates_engine, div_engine, df_sim, expiry_date, strike):
+    """ Greeks precalcolati in blocco (precompute_book_greeks) + rebalance per tick """
+    greeks = precompute_book_greeks(vol_engine, rates_engine, div_engine, df_sim, expiry_date, strike)
+    if strategy_name == 'Whalley':
+        strat = WhalleyHedgingStrategy(risk_aversion=RISK_AVERSION, transaction_cost=TRANSACTION_COST)
+    else:
+        strat = AdaptiveLossStrategy(risk_aversion_weight=LAMBDA_CUSTOM, transaction_cost=TRANSACTION_COST)
+
+    # dt come nel loop originale: calcolato su tutti i tick, anche quelli senza IV
+    seconds = greeks['timestamp'].diff().dt.total_seconds().to_numpy()
+    dt_hours = np.where(np.isnan(seconds), 1.0/60.0, seconds / 3600.0)
+
+    times = greeks['timestamp'].tolist()
+    spots, T, r = greeks['Spot'].to_numpy(), greeks['T'].to_numpy(), greeks['r'].to_numpy()
+    delta, gamma = greeks['Delta'].to_numpy(), greeks['Gamma'].to_numpy()
+    iv, price = greeks['iv'].to_numpy(), greeks['Option_Value'].to_numpy()
+
+    for i in np.flatnonzero(greeks['Valid'].to_numpy()):
+        if strategy_name == 'Whalley':
+            strat.rebalance(times[i], spots[i], T[i], r[i], delta[i], gamma[i], price[i])
+        else:
+            strat.rebalance(timestamp=times[i], S=spots[i], T_rem=T[i], r=r[i],
+                            Delta_PBS=delta[i], Gamma_PBS=gamma[i], Volatility_IV=iv[i],
+                            dt_hours=dt_hours[i], Option_Value=price[i])
+
+    return strat.get_log_dataframe()
+
+def walkforward_kpi(vol_engine, rates_engine, div_engine, df_sim, expiry_date, strike):
+    """ Ricorrenza vettoriale multi-start con una sola partenza (solo KPI) """
+    greeks = precompute_book_greeks(vol_engine, rates_engine, div_engine, df_sim, expiry_date, strike)
+    first_valid = np.flatnonzero(greeks['Valid'].to_numpy())[:1]
+    return whalley_multi_start(greeks, first_valid, RISK_AVERSION, TRANSACTION_COST).iloc[0]
+
+def event_driven_log(vol_engine, rates_engine, div_engine, df_sim, expiry_date, strike):
+    """ Whalley event-driven: log sparso (inizio giorno + trade) """
+    return run_whalley_event_driven(vol_engine, rates_engine, div_engine, df_sim, expiry_date, strike,
+                                    RISK_AVERSION, TRANSACTION_COST).get_log_dataframe()
+
+# Motori veloci che producono un log completo: nome -> (strategia, funzione)
+LOG_ENGINES = {
+    'whalley_precomputed': ('Whalley', precomputed_loop),
+    'adaptive_precomputed': ('Custom_Adaptive', precomputed_loop),
+}
+
+# Motori veloci che producono solo KPI (confrontati con calculate_kpi del riferimento)
+KPI_ENGINES = {
+    'whalley_walkforward': ('Whalley', walkforward_kpi),
+}
+
+# Motori con log sparso (solo eventi), confrontati con compare_event_log
+EVENT_ENGINES = {
+    'whalley_event_driven': ('Whalley', event_driven_log),
+}
+
+# ---------------------------------------------------------------------------
+# CONFRONTI
+# ---------------------------------------------------------------------------
+
+def compare_logs(reference, candidate, rtol=1e-9, atol=1e-9):
+    """
+    Confronta due log colonna per colonna (entro tolleranza) e le decisioni
+    BUY/SELL/HOLD riga per riga. Restituisce un dict con l'esito.
+    """
+    result = {'rows_reference': len(reference), 'rows_candidate': len(candidate),
+              'column_errors': {}, 'decision_mismatches': [], 'passed': True}
+
+    if len(reference) != len(candidate):
+        result['passed'] = False
+        return result
+
+    ref_times = pd.to_datetime(reference['timestamp']).to_numpy()
+    cand_times = pd.to_datetime(candidate['timestamp']).to_numpy()
+    if not np.array_equal(ref_times, cand_times):
+        result['passed'] = False
+        result['column_errors']['timestamp'] = 'timestamp non allineati'
+        return result
+
+    for col in LOG_COLUMNS:
+        if col not in reference.columns:
+            continue
+        if col not in candidate.columns:
+            result['column_errors'][col] = 'colonna mancante'
+            result['passed'] = False
+            continue
+        ref = reference[col].to_numpy(dtype=float)
+        cand = candidate[col].to_numpy(dtype=float)
+        max_abs = float(np.max(np.abs(ref - cand))) if len(ref) else 0.0
+        if not np.allclose(ref, cand, rtol=rtol, atol=atol, equal_nan=True):
+            result['column_errors'][col] = max_abs
+            result['passed'] = False
+
+    mismatch = np.flatnonzero(reference['Action'].to_numpy() != candidate['Action'].to_numpy())
+    if len(mismatch):
+        result['passed'] = False
+        result['decision_mismatches'] = [
+            (str(reference['timestamp'].iloc[i]), reference['Action'].iloc[i], candidate['Action'].iloc[i])
+            for i in mismatch]
+    return result
+
+def compare_event_log(reference, events, rtol=1e-9, atol=1e-9):
+    """
+    Log sparso di un motore event-driven: ogni sua riga deve coincidere con la
+    riga del riferimento allo stesso timestamp, e i trade (BUY/SELL) del
+    riferimento devono comparire tutti, e solo loro, tra i trade del motore.
+    """
+    reference = reference.assign(timestamp=pd.to_datetime(reference['timestamp']))
+    events = events.assign(timestamp=pd.to_datetime(events['timestamp']))
+
+    aligned = reference.set_index('timestamp').reindex(events['timestamp']).reset_index()
+    result = compare_logs(aligned, events, rtol=rtol, atol=atol)
+
+    ref_trades = set(reference.loc[reference['Action'] != 'HOLD', 'timestamp'])
+    event_trades = set(events.loc[events['Action'] != 'HOLD', 'timestamp'])
+    for ts in sorted(ref_trades - event_trades):
+        result['decision_mismatches'].append((str(ts), 'TRADE', 'mancante'))
+    for ts in sorted(event_trades - ref_trades):
+        result['decision_mismatches'].append((str(ts), 'HOLD', 'TRADE'))
+    if ref_trades != event_trades:
+        result['passed'] = False
+    return result
+
+def compare_kpis(reference, candidate, rtol=1e-9, atol=1e-9):
+    errors = {}
+    for col in KPI_COLUMNS:
+        if not np.isclose(float(reference[col]), float(candidate[col]), rtol=rtol, atol=atol, equal_nan=True):
+            errors[col] = (float(reference[col]), float(candidate[col]))
+    return {'column_errors': errors, 'passed': not errors}
+
+def check_golden_report(calculate_kpi, report_path="FINAL_COMPARISON_REPORT.csv", rtol=1e-9, atol=1e-9):
+    """
+    Ricalcola le KPI dai log presenti in results/ e proprietary_strat/results/
+    e le confronta con le righe corrispondenti del report di riferimento.
+    Le righe senza log nel repository vengono saltate.
+    """
+    report = pd.read_csv(report_path, dtype={'Expiry': str})
+    checked, failures = 0, []
+    for row in report.itertuples():
+        if row.Strategy == 'Whalley':
+            path = os.path.join("results", row.Category, f"{row.Moneyness}_{row.Expiry}.csv")
+        else:
+            path = os.path.join("proprietary_strat", "results", row.Category, f"CUSTOM_{row.Moneyness}_{row.Expiry}.csv")
+        if not os.path.exists(path):
+            continue
+        kpi = calculate_kpi(pd.read_csv(path), row.Strategy, row.Category, row.Moneyness, row.Expiry)
+        outcome = compare_kpis(row._asdict(), kpi, rtol=rtol, atol=atol)
+        checked += 1
+        if not outcome['passed']:
+            failures.append((path, outcome['column_errors']))
+    return {'checked': checked, 'failures': failures, 'passed': not failures}
+
+def load_golden_logs(path):
+    """ Log di riferimento salvati: {(strategia, book): DataFrame}; vuoto se il file manca """
+    if not os.path.exists(path):
+        return {}
+    stored = pd.read_parquet(path)
+    # Le colonne dell'altra strategia (tutte NaN dopo il concat) vengono scartate
+    return {(strategy, book): group.drop(columns=['Strategy', 'Book']).dropna(axis=1, how='all').reset_index(drop=True)
+            for (strategy, book), group in stored.groupby(['Strategy', 'Book'], sort=False)}
+
+def save_golden_logs(logs, path):
+    """ Salva {(strategia, book): log} in un unico parquet (float64 esatti) """
+    frames = [log.assign(Strategy=strategy, Book=book) for (strategy, book), log in logs.items()]
+    pd.concat(frames, ignore_index=True).to_parquet(path, index=False)
+
+def check_golden_whalley(inputs, golden_path="results_whalley.csv", rtol=1e-9, atol=1e-9):
+    """
+    Rigenera results_whalley.csv con il loop di riferimento sui dati registrati
+    (stessa scelta di scadenza/strike di main_backtest) e lo confronta col file.
+    """
+    vol_engine, rates_engine, div_engine, df_spot = inputs
+    sim_start_date = max(df_spot['AsOfDate'].min(), vol_engine.available_dates().min())
+    available_expiries = vol_engine.available_expiries()
+    valid_expiries = [e for e in available_expiries if e > sim_start_date + pd.Timedelta(days=45)]
+    expiry = valid_expiries[0] if valid_expiries else available_expiries[-1]
+    strike = round(df_spot[df_spot['AsOfDate'] >= sim_start_date]['Spot'].iloc[0] / 50) * 50
+
+    df_sim = df_spot[(df_spot['AsOfDate'] >= sim_start_date) & (df_spot['AsOfDate'] <= expiry)]
+    log = reference_loop('Whalley', vol_engine, rates_engine, div_engine, df_sim, expiry, strike)
+    golden = pd.read_csv(golden_path)
+    return compare_logs(golden, log, rtol=rtol, atol=atol)
+
+# ---------------------------------------------------------------------------
+# PERFORMANCE
+# ---------------------------------------------------------------------------
+
+def timed(func, *args):
+    start = time.perf_counter()
+    out = func(*args)
+    return out, time.perf_counter() - start
+
+def check_throughput(measured, baseline_path, tolerance=0.30, update=False):
+    """
+    measured: {motore: ticks/s}. Fallisce se un motore scende sotto
+    baseline * (1 - tolerance). Con update=True riscrive la baseline.
+    """
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    failures = {}
+    for engine, tps in measured.items():
+        if engine in baseline and tps < baseline[engine] * (1 - tolerance):
+            failures[engine] = (tps, baseline[engine])
+
+    if update:
+        with open(baseline_path, 'w') as f:
+            json.dump({k: round(v, 1) for k, v in measured.items()}, f, indent=2, sort_keys=True)
+
+    return {'baseline': baseline, 'failures': failures, 'passed': not failures}
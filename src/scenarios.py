@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+
+from src.models import pbs_greeks_vec
+from src.iv_solver import implied_vol_vec
+
+YEAR_SECONDS = 365.25 * 24 * 3600
+
+# Ladder di default: ±10% spot, ±5 punti di volatilità
+SPOT_SHOCKS = np.linspace(-0.10, 0.10, 9)
+VOL_SHOCKS = np.linspace(-0.05, 0.05, 5)
+MIN_IV = 1e-4
+
+def book_final_state(log, df_sim, book_id, expiry_date, strike, vol_engine, rates_engine, div_engine,
+                     position: float = 1.0):
+    """
+    Stato finale di un run: posizione (Held_Shares, Cash) dall'ultima riga del
+    log, mercato dall'ultimo tick di df_sim, con i parametri di quel giorno:
+    IV da VolatilityManager; se manca, IV implicita dall'Option_Value
+    dell'ultima riga del log (al suo spot e T).
+    Open = più di un giorno a scadenza: il run si è fermato per fine dati,
+    non perché l'opzione è arrivata a scadenza.
+    """
+    if log is None or log.empty or df_sim is None or len(df_sim) == 0:
+        return None
+
+    last = log.iloc[-1]
+    now = pd.Timestamp(df_sim['AsOfDate'].iloc[-1])
+    spot = df_sim['Spot'].iloc[-1]
+    today_date = now.normalize()
+    T = (expiry_date - now).total_seconds() / YEAR_SECONDS
+    if T <= 0:
+        return None
+
+    q = div_engine.get_yield_q(today_date)
+    r = rates_engine.get_risk_free_rate(today_date, T * 365.25)
+    iv = vol_engine.get_interpolated_iv(today_date, expiry_date, strike)
+    if iv is None or not iv > 0:
+        log_time = pd.Timestamp(last['timestamp'])
+        T_log = (expiry_date - log_time).total_seconds() / YEAR_SECONDS
+        q_log = div_engine.get_yield_q(log_time.normalize())
+        r_log = rates_engine.get_risk_free_rate(log_time.normalize(), T_log * 365.25)
+        iv = implied_vol_vec(last['Option_Value'], last['Spot'] * np.exp(-q_log * T_log), strike, T_log, r_log, 0.0)[0]
+
+    return {
+        'Book': book_id,
+        'Timestamp': now,
+        'Expiry': expiry_date,
+        'Strike': strike,
+        'Position': position,
+        'Spot': spot,
+        'T': T,
+        'r': r,
+        'q': q,
+        'IV': iv,
+        'Held_Shares': last['Held_Shares'],
+        'Cash': last['Cash'],
+        'Open': T * 365.25 > 1.0
+    }
+
+def risk_ladder(states, spot_shocks=SPOT_SHOCKS, vol_shocks=VOL_SHOCKS):
+    """
+    Ladder spot x vol per tutti i book in un solo passaggio vettoriale su un
+    tensore (book x shock spot x shock vol).
+    states: DataFrame con Spot, Strike, T, r, q, IV, Held_Shares, Position.
+    Hedged P&L = Held_Shares * dS - Position * dOpzione (short call coperta).
+    Net_Delta e Gamma sono del book (azioni - Position * Delta, -Position * Gamma).
+    Restituisce un DataFrame long: una riga per (book, shock spot, shock vol).
+    """
+    states = states.dropna(subset=['IV']).reset_index(drop=True)
+    spot_shocks = np.asarray(spot_shocks, dtype=float)
+    vol_shocks = np.asarray(vol_shocks, dtype=float)
+
+    col = lambda name: states[name].to_numpy(dtype=float)[:, None, None]
+    S, K, T, r, q = col('Spot'), col('Strike'), col('T'), col('r'), col('q')
+    iv, shares, position = col('IV'), col('Held_Shares'), col('Position')
+
+    # Stato base e stato shockato (spot aggiustato per dividendi, PBS con q = 0)
+    base_price, _, _ = pbs_greeks_vec(S * np.exp(-q * T), K, T, r, 0.0, iv)
+    S_shock = S * (1 + spot_shocks[None, :, None])
+    iv_shock = np.maximum(iv + vol_shocks[None, None, :], MIN_IV)
+    price, delta, gamma = pbs_greeks_vec(S_shock * np.exp(-q * T), K, T, r, 0.0, iv_shock)
+
+    hedge_pnl = shares * (S_shock - S)
+    option_pnl = -position * (price - base_price)
+    hedge_pnl, option_pnl = np.broadcast_arrays(hedge_pnl, option_pnl)
+
+    n_books, n_spot, n_vol = price.shape
+    return pd.DataFrame({
+        'Book': np.repeat(states['Book'].to_numpy(), n_spot * n_vol),
+        'Spot_Shock': np.tile(np.repeat(spot_shocks, n_vol), n_books),
+        'Vol_Shock': np.tile(vol_shocks, n_books * n_spot),
+        'Hedge_PnL': hedge_pnl.ravel(),
+        'Option_PnL': option_pnl.ravel(),
+        'Hedged_PnL': (hedge_pnl + option_pnl).ravel(),
+        'Net_Delta': np.broadcast_to(shares - position * delta, price.shape).ravel(),
+        'Gamma': (-position * gamma).ravel()
+    })
+
+def ladder_grid(ladder, value='Hedged_PnL'):
+    """ Griglia aggregata sui book: righe = shock spot, colonne = shock vol """
+    return ladder.pivot_table(index='Spot_Shock', columns='Vol_Shock', values=value, aggfunc='sum')
+
+def save_risk_ladder(states, output_path, open_only: bool = True):
+    """ Calcola e salva la ladder dei book (solo aperti di default) e stampa la griglia aggregata """
+    if not states:
+        print("Nessun book per la risk ladder.")
+        return None
+
+    df_states = pd.DataFrame(states)
+    if open_only:
+        df_states = df_states[df_states['Open']]
+    if df_states.empty:
+        print("Nessun book aperto a fine dati: risk ladder non calcolata.")
+        return None
+
+    ladder = risk_ladder(df_states)
+    ladder.to_csv(output_path, index=False)
+
+    print(f"\n--- RISK LADDER: Hedged P&L aggregato su {df_states['Book'].nunique()} book (spot x vol) ---")
+    print(ladder_grid(ladder).round(2))
+    print(f"Salvata in: {output_path} ({len(ladder)} righe)")
+    return ladder
@@ -1,6 +1,13 @@
 import numpy as np
 import pandas as pd
 
+def whalley_bandwidth_vec(S, T_rem, Gamma_PBS, risk_aversion, transaction_cost):
+    """ calculate_bandwidth su array (book, partenze, tick...) """
+    Gamma_PBS = np.asarray(Gamma_PBS, dtype=float)
+    mask = (Gamma_PBS > 1e-9) & (np.asarray(T_rem) > 0)
+    numerator = 3 * transaction_cost * S * np.where(mask, Gamma_PBS, 0.0) ** 2
+    return np.where(mask, (numerator / (2 * risk_aversion)) ** (1/3), 0.0)
+
 class WhalleyHedgingStrategy:
     def __init__(self, risk_aversion: float, transaction_cost: float, initial_cash: float = 0.0):
         self.gamma = risk_aversion
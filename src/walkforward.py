@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+from src.strategy import whalley_bandwidth_vec
+
+def day_start_positions(timestamps, every_n_days: int = 1):
+    """ Posizione del primo tick di ogni giorno di trading (uno ogni N giorni) """
+    days = pd.to_datetime(timestamps).dt.normalize().to_numpy()
+    firsts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+    return firsts[::every_n_days]
+
+def whalley_multi_start(greeks, start_positions, risk_aversion: float, transaction_cost: float):
+    """
+    Ricorrenza di hedging Whalley eseguita in un solo passaggio sui tick per
+    tutte le date di apertura (vettoriale sulle partenze).
+    A strike fisso i Greeks non dipendono dalla data di partenza, quindi
+    'greeks' (output di precompute_book_greeks) è condiviso: la banda H è la
+    stessa per tutte le partenze e cambia solo lo stato (azioni, cassa).
+
+    Ogni partenza replica WhalleyHedgingStrategy.rebalance dal suo primo tick
+    (i tick senza IV sono saltati come nel loop originale). Le KPI sono
+    accumulate online come in calculate_kpi.
+    """
+    valid = greeks['Valid'].to_numpy()
+    spots = greeks['Spot'].to_numpy()
+    T = greeks['T'].to_numpy()
+    delta = greeks['Delta'].to_numpy()
+    gamma = greeks['Gamma'].to_numpy()
+    price = greeks['Option_Value'].to_numpy()
+
+    starts = np.asarray(start_positions)
+    n_starts = len(starts)
+
+    # H per tick (identica per tutte le partenze), come calculate_bandwidth
+    H = whalley_bandwidth_vec(spots, T, gamma, risk_aversion, transaction_cost)
+
+    shares = np.zeros(n_starts)
+    cash = np.zeros(n_starts)
+    costs = np.zeros(n_starts)
+    trades = np.zeros(n_starts, dtype=int)
+    ticks = np.zeros(n_starts, dtype=int)
+    tracking = np.zeros(n_starts)
+    pnl_first = np.zeros(n_starts)
+    pnl_last = np.zeros(n_starts)
+    inc_sum = np.zeros(n_starts)
+    inc_sq_sum = np.zeros(n_starts)
+
+    first_tick = starts.min() if n_starts else len(valid)
+    for i in np.flatnonzero(valid[first_tick:]) + first_tick:
+        live = starts <= i
+        S = spots[i]
+        upper_bound = delta[i] + H[i]
+        lower_bound = delta[i] - H[i]
+
+        trade_amount = np.where(shares > upper_bound, upper_bound - shares,
+                                np.where(shares < lower_bound, lower_bound - shares, 0.0))
+        trade_amount = np.where(live, trade_amount, 0.0)
+        cost = np.abs(trade_amount * S) * transaction_cost
+        cash += -(trade_amount * S) - cost
+        shares += trade_amount
+        costs += cost
+        trades += (trade_amount != 0)
+
+        # KPI online (P&L = Cash + Azioni*Spot - Opzione)
+        pnl = cash + shares * S - price[i]
+        is_first = live & (ticks == 0)
+        pnl_first = np.where(is_first, pnl, pnl_first)
+        increment = np.where(live & ~is_first, pnl - pnl_last, 0.0)
+        inc_sum += increment
+        inc_sq_sum += increment ** 2
+        pnl_last = np.where(live, pnl, pnl_last)
+        tracking += np.where(live, np.abs(shares - delta[i]), 0.0)
+        ticks += live
+
+    n_inc = ticks - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pnl_vol = np.sqrt(np.maximum(inc_sq_sum - inc_sum ** 2 / n_inc, 0.0) / (n_inc - 1))
+        tracking_error = tracking / ticks
+        trade_freq = trades / ticks * 100
+
+    timestamps = greeks['timestamp']
+    return pd.DataFrame({
+        'Start_Date': timestamps.iloc[starts].to_numpy() if n_starts else [],
+        'Total_Costs_EUR': costs,
+        'Final_PnL_EUR': pnl_last - pnl_first,
+        'PnL_Volatility': np.where(n_inc > 1, pnl_vol, np.nan),
+        'Num_Trades': trades,
+        'Trade_Freq_Pct': np.where(ticks > 0, trade_freq, 0.0),
+        'Delta_Tracking_Error': np.where(ticks > 0, tracking_error, np.nan),
+        'Ticks': ticks
+    })